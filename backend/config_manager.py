@@ -8,52 +8,91 @@ LAN Watcher 配置管理工具
     python config_manager.py load <preset>         # 加载预设配置
     python config_manager.py set <key> <value>     # 设置配置项
     python config_manager.py test-network <cidr>   # 测试网络配置
+    python config_manager.py batch [file]          # 批量执行命令（默认读取标准输入）
 """
 
 import os
 import sys
 import argparse
+import dataclasses
+import functools
 import json
+import shlex
 from typing import Any, Dict
 
 # 添加backend目录到路径
 backend_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, backend_dir)
 
-from models.scan_config import ScanConfig, ScanPresets
-from service.services import scan_config_service
+# 服务层在各命令函数内按需导入，避免 --help 等命令初始化存储和扫描器
+
+@functools.lru_cache(maxsize=1)
+def _cached_get_config():
+    """获取扫描配置（进程内缓存，修改配置后需调用 cache_clear）"""
+    from service.services import scan_config_service
+    return scan_config_service.get_scan_config()
+
+# 布尔值的真值写法
+_BOOL_TRUE = frozenset({'true', '1', 'yes', 'on', '是'})
+
+def _parse_bool(value: str) -> bool:
+    """解析布尔配置值"""
+    return value.lower() in _BOOL_TRUE
+
+def _parse_str(value: str):
+    """解析字符串配置值，'null' 表示清空"""
+    return value if value.lower() != 'null' else None
+
+# 可设置的配置项及其值解析函数
+_CONFIG_PARSERS = {
+    'subnet_cidr': _parse_str,
+    'auto_detect_subnet': _parse_bool,
+    'scan_rate': int,
+    'max_workers': int,
+    'scan_timeout': _parse_str,
+    'max_retries': int,
+    'resolve_hostnames': _parse_bool,
+    'fetch_vendor_info': _parse_bool,
+    'arp_lookup_enabled': _parse_bool,
+    'fallback_enabled': _parse_bool,
+    'enable_port_scan': _parse_bool,
+    'port_range': _parse_str
+}
 
 def show_config():
     """显示当前配置"""
     try:
-        config = scan_config_service.get_scan_config()
+        config = _cached_get_config()
         
-        print("=== 当前扫描配置 ===\n")
-        print(f"网络配置:")
-        print(f"  子网 CIDR: {config.subnet_cidr or '自动检测'}")
-        print(f"  自动检测子网: {'是' if config.auto_detect_subnet else '否'}")
-        print(f"  排除IP: {config.exclude_ips or '无'}")
+        # 收集全部输出后一次写入
+        lines = []
+        lines.append("=== 当前扫描配置 ===\n")
+        lines.append(f"网络配置:")
+        lines.append(f"  子网 CIDR: {config.subnet_cidr or '自动检测'}")
+        lines.append(f"  自动检测子网: {'是' if config.auto_detect_subnet else '否'}")
+        lines.append(f"  排除IP: {list(config.exclude_ips) or '无'}")
         
-        print(f"\n性能参数:")
-        print(f"  扫描速率: {config.scan_rate} 包/秒")
-        print(f"  最大工作线程: {config.max_workers}")
-        print(f"  扫描超时: {config.scan_timeout}")
-        print(f"  最大重试: {config.max_retries}")
+        lines.append(f"\n性能参数:")
+        lines.append(f"  扫描速率: {config.scan_rate} 包/秒")
+        lines.append(f"  最大工作线程: {config.max_workers}")
+        lines.append(f"  扫描超时: {config.scan_timeout}")
+        lines.append(f"  最大重试: {config.max_retries}")
         
-        print(f"\n功能开关:")
-        print(f"  解析主机名: {'是' if config.resolve_hostnames else '否'}")
-        print(f"  获取厂商信息: {'是' if config.fetch_vendor_info else '否'}")
-        print(f"  ARP表查找: {'是' if config.arp_lookup_enabled else '否'}")
-        print(f"  降级扫描: {'是' if config.fallback_enabled else '否'}")
+        lines.append(f"\n功能开关:")
+        lines.append(f"  解析主机名: {'是' if config.resolve_hostnames else '否'}")
+        lines.append(f"  获取厂商信息: {'是' if config.fetch_vendor_info else '否'}")
+        lines.append(f"  ARP表查找: {'是' if config.arp_lookup_enabled else '否'}")
+        lines.append(f"  降级扫描: {'是' if config.fallback_enabled else '否'}")
         
-        print(f"\n高级选项:")
-        print(f"  Ping方法: {', '.join(config.ping_methods)}")
-        print(f"  TCP Ping端口: {config.tcp_ping_ports}")
-        print(f"  ACK Ping端口: {config.ack_ping_ports}")
+        lines.append(f"\n高级选项:")
+        lines.append(f"  Ping方法: {', '.join(config.ping_methods)}")
+        lines.append(f"  TCP Ping端口: {list(config.tcp_ping_ports)}")
+        lines.append(f"  ACK Ping端口: {list(config.ack_ping_ports)}")
         
-        print(f"\n扫描类型:")
-        print(f"  端口扫描: {'启用' if config.enable_port_scan else '禁用'}")
-        print(f"  端口范围: {config.port_range}")
+        lines.append(f"\n扫描类型:")
+        lines.append(f"  端口扫描: {'启用' if config.enable_port_scan else '禁用'}")
+        lines.append(f"  端口范围: {config.port_range}")
+        sys.stdout.write("\n".join(lines) + "\n")
         
     except Exception as e:
         print(f"错误: 无法获取配置 - {e}")
@@ -61,20 +100,28 @@ def show_config():
     
     return True
 
+@functools.lru_cache(maxsize=1)
+def _render_presets() -> str:
+    """渲染预设列表文本（预设是静态数据，只需渲染一次）"""
+    from service.services import scan_config_service
+    
+    presets = scan_config_service.get_available_presets()
+    
+    lines = []
+    lines.append("=== 可用预设配置 ===\n")
+    for preset in presets:
+        lines.append(f"{preset['name'].upper()}:")
+        lines.append(f"  显示名称: {preset['display_name']}")
+        lines.append(f"  描述: {preset['description']}")
+        lines.append("")
+    
+    lines.append("使用方法: python config_manager.py load <preset_name>")
+    return "\n".join(lines) + "\n"
+
 def list_presets():
     """列出可用预设"""
     try:
-        presets = scan_config_service.get_available_presets()
-        
-        print("=== 可用预设配置 ===\n")
-        for preset in presets:
-            print(f"{preset['name'].upper()}:")
-            print(f"  显示名称: {preset['display_name']}")
-            print(f"  描述: {preset['description']}")
-            print()
-        
-        print("使用方法: python config_manager.py load <preset_name>")
-        
+        sys.stdout.write(_render_presets())
     except Exception as e:
         print(f"错误: 无法获取预设列表 - {e}")
         return False
@@ -83,8 +130,11 @@ def list_presets():
 
 def load_preset(preset_name: str):
     """加载预设配置"""
+    from service.services import scan_config_service
+    
     try:
         config = scan_config_service.load_preset(preset_name)
+        _cached_get_config.cache_clear()
         print(f"✓ 已加载 '{preset_name}' 预设配置")
         print(f"  扫描速率: {config.scan_rate} 包/秒")
         print(f"  超时时间: {config.scan_timeout}")
@@ -101,48 +151,29 @@ def load_preset(preset_name: str):
 
 def set_config_value(key: str, value: str):
     """设置配置项"""
+    from service.services import scan_config_service
+    
     try:
         # 获取当前配置
-        config = scan_config_service.get_scan_config()
-        
-        # 配置项映射和类型转换
-        config_map = {
-            'subnet_cidr': (str, 'subnet_cidr'),
-            'auto_detect_subnet': (bool, 'auto_detect_subnet'),
-            'scan_rate': (int, 'scan_rate'),
-            'max_workers': (int, 'max_workers'),
-            'scan_timeout': (str, 'scan_timeout'),
-            'max_retries': (int, 'max_retries'),
-            'resolve_hostnames': (bool, 'resolve_hostnames'),
-            'fetch_vendor_info': (bool, 'fetch_vendor_info'),
-            'arp_lookup_enabled': (bool, 'arp_lookup_enabled'),
-            'fallback_enabled': (bool, 'fallback_enabled'),
-            'enable_port_scan': (bool, 'enable_port_scan'),
-            'port_range': (str, 'port_range')
-        }
+        config = _cached_get_config()
         
-        if key not in config_map:
+        parser = _CONFIG_PARSERS.get(key)
+        if parser is None:
             print(f"错误: 未知的配置项 '{key}'")
-            print("可用配置项:", ', '.join(config_map.keys()))
+            print("可用配置项:", ', '.join(_CONFIG_PARSERS.keys()))
             return False
         
-        value_type, attr_name = config_map[key]
-        
         # 类型转换
-        if value_type == bool:
-            parsed_value = value.lower() in ('true', '1', 'yes', 'on', '是')
-        elif value_type == int:
-            parsed_value = int(value)
-        elif value_type == str:
-            parsed_value = value if value.lower() != 'null' else None
-        else:
-            parsed_value = value
+        parsed_value = parser(value)
         
         # 设置新值
-        setattr(config, attr_name, parsed_value)
+        setattr(config, key, parsed_value)
         
-        # 保存配置
-        scan_config_service.update_scan_config(config)
+        # 保存配置（缓存对象已被修改，无论成功与否都需失效）
+        try:
+            scan_config_service.update_scan_config(config)
+        finally:
+            _cached_get_config.cache_clear()
         
         print(f"✓ 已设置 {key} = {parsed_value}")
         
@@ -157,6 +188,8 @@ def set_config_value(key: str, value: str):
 
 def test_network(cidr: str):
     """测试网络配置"""
+    from service.services import scan_config_service
+    
     try:
         result = scan_config_service.test_network_config(cidr)
         
@@ -179,33 +212,18 @@ def test_network(cidr: str):
 def export_config(filename: str = None):
     """导出配置到文件"""
     try:
-        config = scan_config_service.get_scan_config()
+        config = _cached_get_config()
         
-        # 转换为字典
-        config_dict = {
-            'subnet_cidr': config.subnet_cidr,
-            'auto_detect_subnet': config.auto_detect_subnet,
-            'exclude_ips': config.exclude_ips,
-            'scan_rate': config.scan_rate,
-            'max_workers': config.max_workers,
-            'scan_timeout': config.scan_timeout,
-            'max_retries': config.max_retries,
-            'resolve_hostnames': config.resolve_hostnames,
-            'fetch_vendor_info': config.fetch_vendor_info,
-            'arp_lookup_enabled': config.arp_lookup_enabled,
-            'fallback_enabled': config.fallback_enabled,
-            'ping_methods': config.ping_methods,
-            'tcp_ping_ports': config.tcp_ping_ports,
-            'ack_ping_ports': config.ack_ping_ports,
-            'enable_port_scan': config.enable_port_scan,
-            'port_range': config.port_range
-        }
+        # 转换为字典（字段与 ScanConfig 定义保持一致）
+        config_dict = dataclasses.asdict(config)
         
         if not filename:
             filename = 'scan_config_export.json'
         
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(config_dict, f, indent=2, ensure_ascii=False)
+        # 一次性序列化后整块写入（json.dump 会按每个token调用一次write）
+        data = json.dumps(config_dict, indent=2, ensure_ascii=False).encode('utf-8')
+        with open(filename, 'wb') as f:
+            f.write(data)
         
         print(f"✓ 配置已导出到 {filename}")
         
@@ -215,17 +233,28 @@ def export_config(filename: str = None):
     
     return True
 
+@functools.lru_cache(maxsize=8)
+def _parse_config_file(path: str, mtime_ns: int, size: int) -> Dict[str, Any]:
+    """解析配置文件（以修改时间和大小作为缓存键）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _load_config_file(filename: str) -> Dict[str, Any]:
+    """读取配置文件，文件未变化时复用上次的解析结果"""
+    path = os.path.abspath(filename)
+    st = os.stat(path)
+    return _parse_config_file(path, st.st_mtime_ns, st.st_size)
+
 def import_config(filename: str):
     """从文件导入配置"""
+    from service.services import scan_config_service
+    
     try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            config_dict = json.load(f)
+        config_dict = _load_config_file(filename)
         
-        # 创建配置对象
-        config = ScanConfig(**config_dict)
-        
-        # 保存配置
-        scan_config_service.update_scan_config(config)
+        # 创建并保存配置
+        config = scan_config_service.update_scan_config_from_dict(config_dict)
+        _cached_get_config.cache_clear()
         
         print(f"✓ 配置已从 {filename} 导入")
         print(f"  扫描速率: {config.scan_rate} 包/秒")
@@ -246,7 +275,78 @@ def import_config(filename: str):
     
     return True
 
-def main():
+def run_batch(filename: str = None):
+    """在同一进程内批量执行命令，存储和配置缓存只初始化一次"""
+    try:
+        if filename:
+            with open(filename, 'r', encoding='utf-8') as f:
+                command_lines = f.readlines()
+        else:
+            command_lines = sys.stdin.readlines()
+    except FileNotFoundError:
+        print(f"错误: 文件 '{filename}' 不存在")
+        return False
+    
+    parser = _build_parser()
+    success = True
+    
+    for line_no, line in enumerate(command_lines, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        
+        try:
+            args = parser.parse_args(shlex.split(line))
+        except (SystemExit, ValueError):
+            print(f"错误: 第 {line_no} 行命令无效 - {line}")
+            success = False
+            continue
+        
+        # 子命令不是必填的，如 "--" 这样的行能解析但没有对应的命令
+        if getattr(args, 'func', None) is None:
+            print(f"错误: 第 {line_no} 行命令无效 - {line}")
+            success = False
+            continue
+        
+        if args.command == 'batch':
+            print(f"错误: 第 {line_no} 行不支持嵌套 batch 命令")
+            success = False
+            continue
+        
+        if not args.func(args):
+            success = False
+    
+    return success
+
+# 子命令声明: (名称, 帮助, [(参数名, add_argument参数)], 处理函数)
+_COMMAND_SPECS = [
+    ('show', '显示当前配置', [], lambda a: show_config()),
+    ('presets', '列出可用预设', [], lambda a: list_presets()),
+    ('load', '加载预设配置', [
+        ('preset', {'help': '预设名称 (fast/balanced/thorough/stealth)'}),
+    ], lambda a: load_preset(a.preset)),
+    ('set', '设置配置项', [
+        ('key', {'help': '配置项名称'}),
+        ('value', {'help': '配置项值'}),
+    ], lambda a: set_config_value(a.key, a.value)),
+    ('test-network', '测试网络配置', [
+        ('cidr', {'help': '网络CIDR (如: 192.168.1.0/24)'}),
+    ], lambda a: test_network(a.cidr)),
+    ('export', '导出配置到文件', [
+        ('filename', {'nargs': '?', 'help': '输出文件名 (默认: scan_config_export.json)'}),
+    ], lambda a: export_config(a.filename)),
+    ('import', '从文件导入配置', [
+        ('filename', {'help': '配置文件名'}),
+    ], lambda a: import_config(a.filename)),
+    ('batch', '批量执行命令', [
+        ('filename', {'nargs': '?', 'help': '命令文件，每行一条命令 (默认: 标准输入)'}),
+    ], lambda a: run_batch(a.filename)),
+]
+
+_COMMAND_NAMES = frozenset(spec[0] for spec in _COMMAND_SPECS)
+
+def _build_parser(only: str = None) -> argparse.ArgumentParser:
+    """构建命令行解析器，指定 only 时只构建该子命令的解析器"""
     parser = argparse.ArgumentParser(
         description="LAN Watcher 配置管理工具",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -260,38 +360,26 @@ def main():
   %(prog)s test-network 192.168.1.0/24   # 测试网络配置
   %(prog)s export my_config.json          # 导出配置
   %(prog)s import my_config.json          # 导入配置
+  %(prog)s batch < commands.txt           # 批量执行命令
 """
     )
     
     subparsers = parser.add_subparsers(dest='command', help='可用命令')
     
-    # show命令
-    subparsers.add_parser('show', help='显示当前配置')
-    
-    # presets命令
-    subparsers.add_parser('presets', help='列出可用预设')
-    
-    # load命令
-    load_parser = subparsers.add_parser('load', help='加载预设配置')
-    load_parser.add_argument('preset', help='预设名称 (fast/balanced/thorough/stealth)')
-    
-    # set命令
-    set_parser = subparsers.add_parser('set', help='设置配置项')
-    set_parser.add_argument('key', help='配置项名称')
-    set_parser.add_argument('value', help='配置项值')
-    
-    # test-network命令
-    test_parser = subparsers.add_parser('test-network', help='测试网络配置')
-    test_parser.add_argument('cidr', help='网络CIDR (如: 192.168.1.0/24)')
-    
-    # export命令
-    export_parser = subparsers.add_parser('export', help='导出配置到文件')
-    export_parser.add_argument('filename', nargs='?', help='输出文件名 (默认: scan_config_export.json)')
-    
-    # import命令
-    import_parser = subparsers.add_parser('import', help='从文件导入配置')
-    import_parser.add_argument('filename', help='配置文件名')
+    for name, help_text, arguments, func in _COMMAND_SPECS:
+        if only and name != only:
+            continue
+        sub_parser = subparsers.add_parser(name, help=help_text)
+        for arg_name, arg_kwargs in arguments:
+            sub_parser.add_argument(arg_name, **arg_kwargs)
+        sub_parser.set_defaults(func=func)
     
+    return parser
+
+def main():
+    # 已知子命令时只构建对应解析器；帮助或未知命令时构建完整解析器
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    parser = _build_parser(only=command if command in _COMMAND_NAMES else None)
     args = parser.parse_args()
     
     if not args.command:
@@ -299,24 +387,7 @@ def main():
         return 1
     
     # 执行命令
-    success = True
-    
-    if args.command == 'show':
-        success = show_config()
-    elif args.command == 'presets':
-        success = list_presets()
-    elif args.command == 'load':
-        success = load_preset(args.preset)
-    elif args.command == 'set':
-        success = set_config_value(args.key, args.value)
-    elif args.command == 'test-network':
-        success = test_network(args.cidr)
-    elif args.command == 'export':
-        success = export_config(args.filename)
-    elif args.command == 'import':
-        success = import_config(args.filename)
-    
-    return 0 if success else 1
+    return 0 if args.func(args) else 1
 
 if __name__ == "__main__":
     try:
@@ -1,13 +1,21 @@
 import asyncio
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+import fcntl
+import hashlib
+import os
+import re
+import anyio.to_thread
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from typing import List, Optional
-from datetime import datetime, date
+from dataclasses import asdict
+from datetime import date
 import uvicorn
 import json
 
 from service.services import device_service, scan_config_service
+from service.cache import response_cache
+from service.events import event_broadcaster, format_sse
 from storage.file_storage import (
     Device,
     ScanRecord,
@@ -16,9 +24,10 @@ from storage.file_storage import (
     ChartConfig,
     file_storage,
 )
-from models.oui_parser import init_oui_database
+from models.oui_parser import init_oui_database, oui_parser
+from scanner.scanner import init_scanner_config
 from models.scan_config import ScanConfig
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, TypeAdapter
 
 # 创建FastAPI应用
 app = FastAPI(
@@ -37,24 +46,57 @@ app.add_middleware(
 # 全局任务标志
 periodic_scan_task = None
 
+# 同步路由所用线程池的大小（AnyIO默认40，存储读写都是阻塞IO，默认放宽到128）
+THREADPOOL_SIZE = int(os.getenv("LAN_WATCHER_THREADPOOL_SIZE", "128"))
+
+# 时间线接口的日期格式 YYYY-MM-DD
+DATE_PATTERN = re.compile(r"([0-9]{4})-([0-9]{2})-([0-9]{2})")
+
+# 扫描器文件锁：多worker运行时只有持有该锁的进程执行周期扫描
+SCANNER_LOCK_FILE = file_storage.storage_dir / "scanner.lock"
+scanner_lock = None
+
+
+def acquire_scanner_lock() -> bool:
+    """尝试获取扫描器文件锁，进程退出时锁自动释放"""
+    global scanner_lock
+
+    lock_file = open(SCANNER_LOCK_FILE, "w")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+
+    lock_file.write(str(os.getpid()))
+    lock_file.flush()
+    scanner_lock = lock_file
+    return True
+
 
 # Pydantic模型
-class DeviceAliasUpdate(BaseModel):
+class ApiModel(BaseModel):
+    """API模型基类：模型创建后不可修改"""
+
+    model_config = ConfigDict(frozen=True)
+
+
+class DeviceAliasUpdate(ApiModel):
     custom_name: str
 
 
-class DeviceSearchQuery(BaseModel):
+class DeviceSearchQuery(ApiModel):
     query: str
 
 
-class NetworkStats(BaseModel):
+class NetworkStats(ApiModel):
     total_devices: int
     online_devices: int
     offline_devices: int
     recent_scans: int
 
 
-class ScanResult(BaseModel):
+class ScanResult(ApiModel):
     status: str
     message: Optional[str] = None
     subnet: Optional[str] = None
@@ -63,37 +105,40 @@ class ScanResult(BaseModel):
     duration: Optional[float] = None
 
 
-class DeviceOnlinePeriod(BaseModel):
+class DeviceOnlinePeriod(ApiModel):
     start_time: str
     end_time: Optional[str] = None
 
 
-class DayTimelineDevice(BaseModel):
+class DayTimelineDevice(ApiModel):
     device_id: str
     device_name: str
     ip_address: str
     online_periods: List[DeviceOnlinePeriod]
 
 
-class DayTimelineData(BaseModel):
+class DayTimelineData(ApiModel):
     date: str
     devices: List[DayTimelineDevice]
 
 
-class AppSettingsModel(BaseModel):
+class AppSettingsModel(ApiModel):
     data_retention_days: int
     scan_interval_minutes: int
     auto_scan_enabled: bool
     chart_refresh_interval_seconds: int
 
 
-class ChartConfigModel(BaseModel):
+class ChartConfigModel(ApiModel):
     show_offline_periods: bool
     time_format: str  # '12h' or '24h'
     device_sort_order: str  # 'name', 'ip', or 'last_seen'
 
 
-class ScanConfigModel(BaseModel):
+class ScanConfigModel(ApiModel):
+    # 允许直接从 ScanConfig dataclass 构造（与基类配置合并）
+    model_config = ConfigDict(from_attributes=True)
+
     # 网络配置
     subnet_cidr: Optional[str] = None
     auto_detect_subnet: bool = True
@@ -121,12 +166,12 @@ class ScanConfigModel(BaseModel):
     port_range: str = "1-1000"
 
 
-class ConfigValidationResult(BaseModel):
+class ConfigValidationResult(ApiModel):
     valid: bool
     errors: List[str] = []
 
 
-class NetworkTestResult(BaseModel):
+class NetworkTestResult(ApiModel):
     valid: bool
     error: Optional[str] = None
     network_address: Optional[str] = None
@@ -135,17 +180,38 @@ class NetworkTestResult(BaseModel):
     prefix_length: Optional[int] = None
 
 
-class PresetInfo(BaseModel):
+class PresetInfo(ApiModel):
     name: str
     display_name: str
     description: str
 
 
+# 预设列表的校验/序列化器只构建一次，避免每次请求由FastAPI重新处理 response_model
+PRESETS_ADAPTER = TypeAdapter(List[PresetInfo])
+
+
 @app.on_event("startup")
 async def startup_event():
     """应用启动时执行"""
     global periodic_scan_task
 
+    # 配置同步路由使用的线程池大小
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+
+    # 初始化扫描器配置
+    try:
+        init_scanner_config()
+        print("Scanner configuration initialized")
+    except Exception as e:
+        print(f"Warning: Could not initialize scanner config: {e}")
+
+    # 多worker时只有一个进程负责数据维护和周期扫描，避免重复执行nmap扫描
+    if not acquire_scanner_lock():
+        print(f"Worker {os.getpid()}: periodic scan is handled by another worker")
+        # OUI数据由负责扫描的worker导入，这里只预先加载已有的缓存
+        oui_parser.load()
+        return
+
     # 初始化文件存储系统
     try:
         print("Initializing file storage system...")
@@ -162,15 +228,6 @@ async def startup_event():
     except Exception as e:
         print(f"Warning: Could not initialize OUI database: {e}")
 
-    # 初始化扫描器配置
-    try:
-        from scanner.scanner import init_scanner_config
-
-        init_scanner_config()
-        print("Scanner configuration initialized")
-    except Exception as e:
-        print(f"Warning: Could not initialize scanner config: {e}")
-
     # 启动周期性扫描任务
     periodic_scan_task = asyncio.create_task(device_service.start_periodic_scan())
     print("Periodic scan task started")
@@ -188,56 +245,99 @@ async def shutdown_event():
         except asyncio.CancelledError:
             print("Periodic scan task cancelled")
 
+    # 不再接受新的手动扫描，丢弃排队中的扫描
+    device_service.scan_executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _render_json(payload) -> tuple:
+    """序列化响应内容，返回 (响应体, ETag)
+    payload 只能包含JSON原生类型（加载函数返回原始dict/asdict结果），
+    紧凑格式下 json.dumps 直接走C编码器，无需 jsonable_encoder 逐层转换"""
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode(
+        "utf-8"
+    )
+    etag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+    return body, etag
+
+
+def _dataclass_response(items) -> JSONResponse:
+    """直接序列化存储层的dataclass结果，不经过 jsonable_encoder 的逐字段遍历"""
+    if isinstance(items, list):
+        return JSONResponse([asdict(item) for item in items])
+    return JSONResponse(asdict(items))
+
+
+# 各缓存接口的策略: 键 -> (服务端缓存秒数, Cache-Control)
+# 用户可修改的数据使用 no-cache，浏览器每次带 ETag 重新验证，修改后立即可见；
+# 服务端缓存在修改时主动失效，TTL只兜底其他进程（多worker、命令行工具）的修改
+CACHE_POLICIES = {
+    "devices": (2, "no-cache"),
+    "online_devices": (2, "no-cache"),
+    "stats": (2, "max-age=2"),
+    "settings": (300, "no-cache"),
+    "chart_config": (60, "no-cache"),
+    "scan_config": (300, "no-cache"),
+}
+
+
+def _cached_json_response(request: Request, key: str, loader) -> Response:
+    """返回缓存的JSON响应，客户端的 If-None-Match 命中时返回304"""
+    ttl, cache_control = CACHE_POLICIES[key]
+    body, etag = response_cache.get_or_load(
+        key, lambda: _render_json(loader()), ttl=ttl
+    )
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 
 # API路由
+# 存储层是同步文件IO：只做存储读写的路由声明为普通函数，
+# 由FastAPI放到线程池执行，避免阻塞事件循环
 @app.get("/api/devices")
-async def get_devices():
+def get_devices(request: Request):
     """获取所有设备列表"""
-    devices = device_service.get_all_devices()
-    return devices
+    return _cached_json_response(request, "devices", device_service.get_all_devices_data)
 
 
 @app.get("/api/devices/online")
-async def get_online_devices():
+def get_online_devices(request: Request):
     """获取在线设备列表"""
-    devices = device_service.get_online_devices()
-    return devices
+    return _cached_json_response(
+        request, "online_devices", device_service.get_online_devices_data
+    )
 
 
 @app.get("/api/devices/{device_id}")
-async def get_device(device_id: str):
+def get_device(device_id: str):
     """获取单个设备详情"""
     device = device_service.get_device_by_id(device_id)
     if not device:
         raise HTTPException(status_code=404, detail="Device not found")
-    return device
+    return _dataclass_response(device)
 
 
 @app.get("/api/devices/{device_id}/history")
-async def get_device_history(device_id: str, hours: int = 24):
+def get_device_history(device_id: str, hours: int = 24):
     """获取设备历史记录"""
     device = device_service.get_device_by_id(device_id)
     if not device:
         raise HTTPException(status_code=404, detail="Device not found")
 
     history = device_service.get_device_history(device_id, hours)
-    return history
+    return _dataclass_response(history)
 
 
 @app.post("/api/scan")
-async def scan_network(
-    subnet: Optional[str] = None,
-    scan_type: str = "ping",
-    background_tasks: BackgroundTasks = None,
-):
+async def scan_network(subnet: Optional[str] = None, scan_type: str = "ping"):
     """手动触发网络扫描"""
-    # 检查是否已有扫描在进行
-    if device_service.scanning:
+    # 在专用扫描线程中执行扫描，避免阻塞API响应；已有扫描在进行或排队时直接返回
+    if not await asyncio.to_thread(
+        device_service.start_background_scan, subnet, scan_type
+    ):
         return {"status": "error", "message": "Scan already in progress"}
 
-    # 在后台任务中执行扫描，避免阻塞API响应
-    background_tasks.add_task(device_service.scan_network_sync, subnet, scan_type)
-
     return {
         "status": "started",
         "message": "Scan started in background",
@@ -247,47 +347,114 @@ async def scan_network(
 
 
 @app.get("/api/stats")
-async def get_network_stats():
+def get_network_stats(request: Request):
     """获取网络统计信息"""
-    stats = device_service.get_network_stats()
-    return stats
+    return _cached_json_response(request, "stats", device_service.get_network_stats)
 
 
 @app.get("/api/scan-sessions")
-async def get_scan_sessions(limit: int = 10):
+def get_scan_sessions(limit: int = 10):
     """获取扫描会话历史"""
-    sessions = device_service.get_scan_sessions(limit)
-    return sessions
+    return JSONResponse(device_service.get_scan_sessions_data(limit))
 
 
 @app.get("/api/scan-status")
-async def get_scan_status():
+def get_scan_status():
     """获取当前扫描状态"""
     return {
-        "scanning": device_service.scanning,
+        "scanning": device_service.is_scan_running(),
         "scan_interval": device_service.scan_interval,
         "last_scan_time": device_service.last_scan_time,
     }
 
 
-class ScanIntervalRequest(BaseModel):
+# SSE推送的最小间隔（秒），即最多20Hz，期间的中间事件只保留最新一条
+EVENT_THROTTLE_SECONDS = 0.05
+# 无事件时的心跳间隔（秒），同时检查其他worker进程是否更新了设备数据
+EVENT_KEEPALIVE_SECONDS = 15
+
+
+async def _event_stream(request: Request):
+    """SSE事件流：推送扫描开始/完成和设备变化事件，代替前端轮询"""
+    subscriber_id = event_broadcaster.subscribe()
+    devices_version = file_storage.get_data_version(file_storage.devices_file)
+    scanning = await asyncio.to_thread(device_service.is_scan_running)
+    try:
+        yield "retry: 5000\n\n"
+        while not await request.is_disconnected():
+            events = await event_broadcaster.wait(
+                subscriber_id, EVENT_KEEPALIVE_SECONDS
+            )
+            if events is None:
+                # 扫描可能发生在其他worker进程中，通过扫描锁和设备文件版本发现变化
+                running = await asyncio.to_thread(device_service.is_scan_running)
+                version = file_storage.get_data_version(file_storage.devices_file)
+                changed = False
+                if running != scanning:
+                    scanning = running
+                    changed = True
+                    yield format_sse(
+                        {"type": "scan_started" if running else "scan_completed"}
+                    )
+                if version != devices_version:
+                    devices_version = version
+                    changed = True
+                    yield format_sse({"type": "devices_changed"})
+                if not changed:
+                    yield ": keepalive\n\n"
+                continue
+
+            devices_version = file_storage.get_data_version(file_storage.devices_file)
+            for event in events:
+                if event.get("type") == "scan_started":
+                    scanning = True
+                elif event.get("type") == "scan_completed":
+                    scanning = False
+                yield format_sse(event)
+            await asyncio.sleep(EVENT_THROTTLE_SECONDS)
+    finally:
+        event_broadcaster.unsubscribe(subscriber_id)
+
+
+@app.get("/api/events")
+async def get_events(request: Request):
+    """订阅扫描和设备变化事件（Server-Sent Events）"""
+    return StreamingResponse(
+        _event_stream(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/api/pool-stats")
+async def get_pool_stats():
+    """获取同步路由线程池的使用情况"""
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    return {
+        "total": limiter.total_tokens,
+        "in_use": limiter.borrowed_tokens,
+        "available": limiter.available_tokens,
+    }
+
+
+class ScanIntervalRequest(ApiModel):
     interval: int
 
 
 @app.post("/api/scan-interval")
-async def set_scan_interval(request: ScanIntervalRequest):
+def set_scan_interval(request: ScanIntervalRequest):
     """设置扫描间隔（秒）"""
     if request.interval < 60:
         raise HTTPException(
             status_code=400, detail="Scan interval must be at least 60 seconds"
         )
 
-    device_service.scan_interval = request.interval
+    device_service.set_scan_interval(request.interval)
     return {"status": "success", "scan_interval": request.interval}
 
 
 @app.put("/api/devices/{device_id}/alias")
-async def update_device_alias(device_id: str, alias_data: DeviceAliasUpdate):
+def update_device_alias(device_id: str, alias_data: DeviceAliasUpdate):
     """更新设备别名"""
     try:
         device = device_service.update_device_alias(device_id, alias_data.custom_name)
@@ -297,7 +464,7 @@ async def update_device_alias(device_id: str, alias_data: DeviceAliasUpdate):
 
 
 @app.put("/api/devices/mac/{mac_address}/alias")
-async def update_device_alias_by_mac(mac_address: str, alias_data: DeviceAliasUpdate):
+def update_device_alias_by_mac(mac_address: str, alias_data: DeviceAliasUpdate):
     """通过MAC地址更新设备别名"""
     try:
         device = device_service.update_device_alias_by_mac(
@@ -309,7 +476,7 @@ async def update_device_alias_by_mac(mac_address: str, alias_data: DeviceAliasUp
 
 
 @app.get("/api/devices/search")
-async def search_devices(q: str):
+def search_devices(q: str):
     """搜索设备"""
     if not q or len(q.strip()) < 2:
         raise HTTPException(
@@ -317,107 +484,81 @@ async def search_devices(q: str):
         )
 
     devices = device_service.search_devices(q.strip())
-    return devices
+    return _dataclass_response(devices)
 
 
 @app.get("/api/oui/{mac_address}")
-async def lookup_vendor(mac_address: str):
+def lookup_vendor(mac_address: str):
     """根据MAC地址查找厂商信息"""
+    # OUI表在启动时已加载到内存，这里只做字典查找，不再在请求中重新导入
     try:
-        from models.oui_parser import oui_parser
-
-        # 确保OUI缓存已加载
-        cache = oui_parser._load_cache()
-        if not cache:
-            # 如果缓存为空，尝试重新导入
-            oui_parser.import_to_cache()
-            cache = oui_parser._load_cache()
-
         vendor = oui_parser.lookup_vendor(mac_address)
-        if vendor:
-            return {"mac_address": mac_address, "vendor": vendor}
-        else:
-            raise HTTPException(status_code=404, detail="Vendor not found")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-
-@app.get("/api/timeline/{date_str}", response_model=DayTimelineData)
-async def get_timeline_data(date_str: str):
+    if not vendor:
+        raise HTTPException(status_code=404, detail="Vendor not found")
+
+    # OUI数据在运行期间不会变化，允许客户端长期缓存
+    return JSONResponse(
+        {"mac_address": mac_address, "vendor": vendor},
+        headers={"Cache-Control": "public, max-age=86400"},
+    )
+
+
+def _stream_timeline(date_str: str, devices: List[dict], periods_by_device: dict):
+    """按设备逐段序列化时间线数据（结构同 DayTimelineData），边生成边发送"""
+    yield b'{"date":' + json.dumps(date_str).encode("utf-8") + b',"devices":['
+    for index, device in enumerate(devices):
+        timeline_device = {
+            "device_id": device["id"],
+            "device_name": device.get("custom_name")
+            or device.get("hostname")
+            or device["ip_address"],
+            "ip_address": device["ip_address"],
+            "online_periods": periods_by_device.get(device["id"], []),
+        }
+        chunk = json.dumps(timeline_device, ensure_ascii=False, separators=(",", ":"))
+        yield (("," if index else "") + chunk).encode("utf-8")
+    yield b"]}"
+
+
+# 响应由生成器直接序列化，模型只用于生成API文档
+@app.get("/api/timeline/{date_str}", responses={200: {"model": DayTimelineData}})
+def get_timeline_data(date_str: str, request: Request):
     """获取指定日期的设备时间线数据"""
     try:
         # 解析日期字符串
-        target_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-        start_of_day = datetime.combine(target_date, datetime.min.time()).isoformat()
-        end_of_day = datetime.combine(target_date, datetime.max.time()).isoformat()
-
-        # 获取所有设备
-        devices = device_service.get_all_devices()
-
-        timeline_devices = []
-        for device in devices:
-            # 获取该设备在指定日期的扫描记录
-            all_records = device_service.get_device_history(
-                device.id, 24 * 7
-            )  # 获取一周数据确保覆盖
-
-            # 过滤指定日期的记录
-            scan_records = [
-                record
-                for record in all_records
-                if start_of_day <= record.scan_time <= end_of_day
-            ]
-
-            # 构建在线时间段
-            online_periods = []
-            if scan_records:
-                # 按时间正序排序（重要！）
-                scan_records.sort(key=lambda x: x.scan_time)
-
-                current_period_start = None
-                last_status = None
-
-                for record in scan_records:
-                    if record.is_online and last_status != True:
-                        # 开始在线时段
-                        current_period_start = record.scan_time
-                    elif (
-                        not record.is_online
-                        and last_status == True
-                        and current_period_start
-                    ):
-                        # 结束在线时段
-                        online_periods.append(
-                            {
-                                "start_time": current_period_start,
-                                "end_time": record.scan_time,
-                            }
-                        )
-                        current_period_start = None
-
-                    last_status = record.is_online
-
-                # 如果最后一个记录是在线状态，且时段还没结束
-                if last_status == True and current_period_start:
-                    online_periods.append(
-                        {
-                            "start_time": current_period_start,
-                            "end_time": None,  # 表示仍在线
-                        }
-                    )
-
-            timeline_devices.append(
-                DayTimelineDevice(
-                    device_id=device.id,
-                    device_name=device.custom_name
-                    or device.hostname
-                    or device.ip_address,
-                    ip_address=device.ip_address,
-                    online_periods=online_periods,
-                )
-            )
-
-        return DayTimelineData(date=date_str, devices=timeline_devices)
+        match = DATE_PATTERN.fullmatch(date_str)
+        if not match:
+            raise ValueError(date_str)
+        target_date = date(int(match[1]), int(match[2]), int(match[3]))
+
+        # 时间线只依赖设备和扫描记录文件，用它们的版本生成ETag，
+        # 数据未变化时直接返回304，无需计算和序列化（先取版本再读数据，最多多一次完整响应）
+        version = file_storage.get_data_version(
+            file_storage.devices_file,
+            file_storage.scan_records_file,
+            file_storage.scan_records_log_file,
+        )
+        etag = (
+            '"'
+            + hashlib.blake2b(f"{date_str}:{version}".encode(), digest_size=8).hexdigest()
+            + '"'
+        )
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
+
+        # 获取所有设备及其当天在线时段
+        devices = device_service.get_all_devices_data()
+        periods_by_device = device_service.get_day_online_periods(target_date)
+
+        return StreamingResponse(
+            _stream_timeline(date_str, devices, periods_by_device),
+            media_type="application/json",
+            headers=headers,
+        )
 
     except ValueError:
         raise HTTPException(
@@ -428,37 +569,32 @@ async def get_timeline_data(date_str: str):
 
 
 @app.get("/api/settings", response_model=AppSettingsModel)
-async def get_app_settings():
+def get_app_settings(request: Request):
     """获取应用设置"""
+
+    def load_settings():
+        # 字段与 AppSettingsModel 一致，直接序列化dataclass，不再构造Pydantic模型
+        return asdict(file_storage.get_settings())
+
     try:
-        settings = file_storage.get_settings()
-        return AppSettingsModel(
-            data_retention_days=settings.data_retention_days,
-            scan_interval_minutes=settings.scan_interval_minutes,
-            auto_scan_enabled=settings.auto_scan_enabled,
-            chart_refresh_interval_seconds=settings.chart_refresh_interval_seconds,
-        )
+        return _cached_json_response(request, "settings", load_settings)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.put("/api/settings", response_model=AppSettingsModel)
-async def update_app_settings(settings: AppSettingsModel):
+def update_app_settings(settings: AppSettingsModel):
     """更新应用设置"""
     try:
         # 创建新的设置对象
-        new_settings = AppSettings(
-            data_retention_days=settings.data_retention_days,
-            scan_interval_minutes=settings.scan_interval_minutes,
-            auto_scan_enabled=settings.auto_scan_enabled,
-            chart_refresh_interval_seconds=settings.chart_refresh_interval_seconds,
-        )
+        new_settings = AppSettings(**settings.model_dump())
 
         # 保存设置
         file_storage.update_settings(new_settings)
+        response_cache.invalidate("settings")
 
         # 如果扫描间隔发生变化，更新服务
-        device_service.scan_interval = settings.scan_interval_minutes * 60
+        device_service.set_scan_interval(settings.scan_interval_minutes * 60)
 
         return settings
 
@@ -467,32 +603,29 @@ async def update_app_settings(settings: AppSettingsModel):
 
 
 @app.get("/api/chart-config", response_model=ChartConfigModel)
-async def get_chart_config():
+def get_chart_config(request: Request):
     """获取图表配置"""
+
+    def load_chart_config():
+        # 字段与 ChartConfigModel 一致，直接序列化dataclass
+        return asdict(file_storage.get_chart_config())
+
     try:
-        config = file_storage.get_chart_config()
-        return ChartConfigModel(
-            show_offline_periods=config.show_offline_periods,
-            time_format=config.time_format,
-            device_sort_order=config.device_sort_order,
-        )
+        return _cached_json_response(request, "chart_config", load_chart_config)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.put("/api/chart-config", response_model=ChartConfigModel)
-async def update_chart_config(config: ChartConfigModel):
+def update_chart_config(config: ChartConfigModel):
     """更新图表配置"""
     try:
         # 创建新的配置对象
-        new_config = ChartConfig(
-            show_offline_periods=config.show_offline_periods,
-            time_format=config.time_format,
-            device_sort_order=config.device_sort_order,
-        )
+        new_config = ChartConfig(**config.model_dump())
 
         # 保存配置
         file_storage.update_chart_config(new_config)
+        response_cache.invalidate("chart_config")
         return config
 
     except Exception as e:
@@ -503,58 +636,25 @@ async def update_chart_config(config: ChartConfigModel):
 
 
 @app.get("/api/scan-config", response_model=ScanConfigModel)
-async def get_scan_config():
+def get_scan_config(request: Request):
     """获取当前扫描配置"""
+
+    def load_scan_config():
+        # 字段与 ScanConfigModel 一致，直接序列化dataclass
+        return asdict(scan_config_service.get_scan_config())
+
     try:
-        config = scan_config_service.get_scan_config()
-        return ScanConfigModel(
-            subnet_cidr=config.subnet_cidr,
-            auto_detect_subnet=config.auto_detect_subnet,
-            exclude_ips=config.exclude_ips,
-            scan_rate=config.scan_rate,
-            max_workers=config.max_workers,
-            scan_timeout=config.scan_timeout,
-            max_retries=config.max_retries,
-            resolve_hostnames=config.resolve_hostnames,
-            fetch_vendor_info=config.fetch_vendor_info,
-            arp_lookup_enabled=config.arp_lookup_enabled,
-            fallback_enabled=config.fallback_enabled,
-            ping_methods=config.ping_methods,
-            tcp_ping_ports=config.tcp_ping_ports,
-            ack_ping_ports=config.ack_ping_ports,
-            enable_port_scan=config.enable_port_scan,
-            port_range=config.port_range,
-        )
+        return _cached_json_response(request, "scan_config", load_scan_config)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.put("/api/scan-config", response_model=ScanConfigModel)
-async def update_scan_config(config: ScanConfigModel):
+def update_scan_config(config: ScanConfigModel):
     """更新扫描配置"""
     try:
-        # 转换为ScanConfig对象
-        scan_config = ScanConfig(
-            subnet_cidr=config.subnet_cidr,
-            auto_detect_subnet=config.auto_detect_subnet,
-            exclude_ips=config.exclude_ips,
-            scan_rate=config.scan_rate,
-            max_workers=config.max_workers,
-            scan_timeout=config.scan_timeout,
-            max_retries=config.max_retries,
-            resolve_hostnames=config.resolve_hostnames,
-            fetch_vendor_info=config.fetch_vendor_info,
-            arp_lookup_enabled=config.arp_lookup_enabled,
-            fallback_enabled=config.fallback_enabled,
-            ping_methods=config.ping_methods,
-            tcp_ping_ports=config.tcp_ping_ports,
-            ack_ping_ports=config.ack_ping_ports,
-            enable_port_scan=config.enable_port_scan,
-            port_range=config.port_range,
-        )
-
-        # 保存配置
-        updated_config = scan_config_service.update_scan_config(scan_config)
+        # 验证并保存配置
+        scan_config_service.update_scan_config_from_dict(config.model_dump())
         return config
 
     except ValueError as e:
@@ -563,38 +663,27 @@ async def update_scan_config(config: ScanConfigModel):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/api/scan-config/presets", response_model=List[PresetInfo])
+# 响应由 PRESETS_ADAPTER 直接序列化，模型只用于生成API文档
+@app.get("/api/scan-config/presets", responses={200: {"model": List[PresetInfo]}})
 async def get_scan_presets():
     """获取可用的预设配置列表"""
     try:
-        return scan_config_service.get_available_presets()
+        presets = PRESETS_ADAPTER.validate_python(
+            scan_config_service.get_available_presets()
+        )
+        return Response(
+            content=PRESETS_ADAPTER.dump_json(presets), media_type="application/json"
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/api/scan-config/presets/{preset_name}", response_model=ScanConfigModel)
-async def load_scan_preset(preset_name: str):
+def load_scan_preset(preset_name: str):
     """加载预设配置"""
     try:
         config = scan_config_service.load_preset(preset_name)
-        return ScanConfigModel(
-            subnet_cidr=config.subnet_cidr,
-            auto_detect_subnet=config.auto_detect_subnet,
-            exclude_ips=config.exclude_ips,
-            scan_rate=config.scan_rate,
-            max_workers=config.max_workers,
-            scan_timeout=config.scan_timeout,
-            max_retries=config.max_retries,
-            resolve_hostnames=config.resolve_hostnames,
-            fetch_vendor_info=config.fetch_vendor_info,
-            arp_lookup_enabled=config.arp_lookup_enabled,
-            fallback_enabled=config.fallback_enabled,
-            ping_methods=config.ping_methods,
-            tcp_ping_ports=config.tcp_ping_ports,
-            ack_ping_ports=config.ack_ping_ports,
-            enable_port_scan=config.enable_port_scan,
-            port_range=config.port_range,
-        )
+        return ScanConfigModel.model_validate(config)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -605,7 +694,7 @@ async def load_scan_preset(preset_name: str):
 async def validate_scan_config(config: ScanConfigModel):
     """验证扫描配置"""
     try:
-        config_dict = config.dict()
+        config_dict = config.model_dump()
         result = scan_config_service.validate_config(config_dict)
         return ConfigValidationResult(valid=result["valid"], errors=result["errors"])
     except Exception as e:
@@ -623,14 +712,18 @@ async def test_network_config(subnet_cidr: str):
 
 
 if __name__ == "__main__":
-    import os
-
     # 从环境变量获取配置，支持自定义监听地址
     host = os.getenv("LAN_WATCHER_HOST", "127.0.0.1")
     port = int(os.getenv("LAN_WATCHER_PORT", "8000"))
     reload = os.getenv("LAN_WATCHER_RELOAD", "true").lower() == "true"
+    workers = int(os.getenv("LAN_WATCHER_WORKERS", "1"))
+    # 事件循环和HTTP解析器，auto 会在安装了 uvloop / httptools 时自动使用它们
+    loop = os.getenv("LAN_WATCHER_LOOP", "auto")
+    http = os.getenv("LAN_WATCHER_HTTP", "auto")
+    # 热重载模式只支持单进程
+    reload = reload and workers == 1
 
     print(f"Starting LAN Watcher on {host}:{port}")
-    print(f"Reload mode: {reload}")
+    print(f"Reload mode: {reload}, workers: {workers}, loop: {loop}, http: {http}")
 
-    uvicorn.run("main:app", host=host, port=port, reload=reload)
+    uvicorn.run("main:app", host=host, port=port, reload=reload, workers=workers, loop=loop, http=http)
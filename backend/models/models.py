@@ -9,8 +9,8 @@ class OuiVendor(Base):
     """OUI厂商信息表"""
     __tablename__ = "oui_vendors"
     
-    id = Column(Integer, primary_key=True, index=True)
-    oui = Column(String(8), unique=True, index=True, nullable=False)  # MAC前缀，如 "001B21"
+    # OUI直接作为主键，按OUI查询只需一次主键B树查找，不再经过代理id和二级索引
+    oui = Column(String(8), primary_key=True)  # MAC前缀，如 "001B21"
     vendor_name = Column(Text, nullable=False)
     vendor_address = Column(Text)
 
@@ -34,6 +34,8 @@ class Device(Base):
 
 class ScanRecord(Base):
     __tablename__ = "scan_records"
+    # 图表按设备查询并按扫描时间排序，复合索引可直接做范围扫描（同时覆盖只按 device_id 的查询）
+    __table_args__ = (Index("ix_scan_records_device_time", "device_id", "scan_time"),)
     
     id = Column(Integer, primary_key=True, index=True)
     device_id = Column(Integer, ForeignKey("devices.id"))
@@ -48,7 +50,7 @@ class ScanSession(Base):
     __tablename__ = "scan_sessions"
     
     id = Column(Integer, primary_key=True, index=True)
-    start_time = Column(DateTime, default=datetime.utcnow)
+    start_time = Column(DateTime, default=datetime.utcnow, index=True)  # 会话历史按开始时间排序
     end_time = Column(DateTime)
     subnet = Column(String(18))  # 如 192.168.1.0/24
     devices_found = Column(Integer, default=0)
@@ -1,9 +1,32 @@
 import re
 import os
-import json
-from typing import List, Tuple, Dict
+import marshal
+from functools import lru_cache
+import mmap
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
 from pathlib import Path
 
+# MAC地址前3个字节（OUI），支持 AA:BB:CC、AA-BB-CC、AABBCC 和 aabb.cc 等写法
+MAC_OUI_PATTERN = re.compile(r'([0-9A-F]{2})[:.-]?([0-9A-F]{2})[:.-]?([0-9A-F]{2})', re.IGNORECASE)
+
+# 同一批设备的MAC会被反复查询，缓存解析结果
+@lru_cache(maxsize=4096)
+def extract_oui(mac_address: str) -> Optional[int]:
+    """从MAC地址中提取OUI（前3个字节组成的24位整数，即OUI缓存的键），格式不正确时返回None"""
+    match = MAC_OUI_PATTERN.match(mac_address)
+    if not match:
+        return None
+    return int(match.group(1) + match.group(2) + match.group(3), 16)
+
+# OUI记录行，格式如: "28-6F-B9   (hex)                Nokia Shanghai Bell Co., Ltd."
+# 支持带连字符和不带连字符的格式。直接在文件的字节内容上多行匹配，
+# 相邻两条记录行之间即为上一条记录的 base 16 行和地址行
+OUI_HEX_LINE_PATTERN = re.compile(
+    rb'^[ \t]*([0-9A-F]{2}-[0-9A-F]{2}-[0-9A-F]{2}|[0-9A-F]{6})[ \t]+\(hex\)[ \t]+([^\n]+)$',
+    re.MULTILINE,
+)
+
 class OuiParser:
     def __init__(self, oui_file_path: str = None, cache_file_path: str = None):
         # 获取当前文件所在目录的父目录作为backend根目录
@@ -15,81 +38,100 @@ class OuiParser:
             self.oui_file_path = oui_file_path
             
         if cache_file_path is None:
-            self.cache_file_path = backend_root / "storage" / "data" / "oui_cache.json"
+            self.cache_file_path = backend_root / "storage" / "data" / "oui_cache.bin"
         else:
             self.cache_file_path = Path(cache_file_path)
         self.cache_file_path.parent.mkdir(parents=True, exist_ok=True)
         self._oui_cache = None
+        # 首次加载可能由多个线程池线程同时触发，只让一个线程读取缓存文件
+        self._load_lock = threading.Lock()
     
-    def parse_oui_file(self) -> List[Tuple[str, str, str]]:
-        """解析OUI文件，返回(oui, vendor_name, vendor_address)的列表"""
+    def iter_oui_records(self) -> Iterator[Tuple[str, str, str]]:
+        """逐条解析OUI文件，生成(oui, vendor_name, vendor_address)，不在内存中保存完整列表"""
         if not os.path.exists(self.oui_file_path):
             raise FileNotFoundError(f"OUI file not found: {self.oui_file_path}")
         
-        oui_records = []
-        current_oui = None
-        current_vendor = None
-        current_address_lines = []
-        
-        with open(self.oui_file_path, 'r', encoding='utf-8', errors='ignore') as file:
-            for line in file:
-                line = line.strip()
-                
-                # 匹配OUI记录行，格式如: "28-6F-B9   (hex)                Nokia Shanghai Bell Co., Ltd."
-                # 支持带连字符和不带连字符的格式
-                oui_match = re.match(r'^([0-9A-F]{2}-[0-9A-F]{2}-[0-9A-F]{2}|[0-9A-F]{6})\s+\(hex\)\s+(.+)$', line)
-                if oui_match:
-                    # 保存前一个记录
-                    if current_oui and current_vendor:
-                        address = '\n'.join(current_address_lines).strip()
-                        oui_records.append((current_oui, current_vendor, address))
-                    
-                    # 开始新记录
-                    current_oui = oui_match.group(1).replace('-', '')  # 移除连字符，统一格式
-                    current_vendor = oui_match.group(2).strip()
-                    current_address_lines = []
-                    continue
-                
-                # 匹配base 16记录行，格式如: "28-6F-B9     (base 16)		Nokia Shanghai Bell Co., Ltd."
-                base16_match = re.match(r'^([0-9A-F]{2}-[0-9A-F]{2}-[0-9A-F]{2}|[0-9A-F]{6})\s+\(base 16\)\s+(.+)$', line)
-                if base16_match:
-                    # 这行通常重复厂商名称，跳过或用作验证
-                    continue
-                
-                # 如果当前有OUI记录在处理，收集地址信息
-                if current_oui and line and not line.startswith('\t\t\t'):
-                    # 清理和格式化地址行
-                    if line.strip():
-                        current_address_lines.append(line.strip())
+        if os.path.getsize(self.oui_file_path) == 0:
+            return
         
-        # 保存最后一个记录
-        if current_oui and current_vendor:
-            address = '\n'.join(current_address_lines).strip()
-            oui_records.append((current_oui, current_vendor, address))
+        with open(self.oui_file_path, 'rb') as file, \
+                mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as content:
+            # 逐行循环交给正则引擎在C层完成，Python只处理匹配到的记录，且只解码匹配到的片段；
+            # 找到下一条记录行时，上一条记录的地址块才完整
+            previous = None
+            # 同一厂商通常有大量OUI记录，厂商名称和地址相同的记录共享同一个字符串对象
+            string_pool: Dict[str, str] = {}
+            for match in OUI_HEX_LINE_PATTERN.finditer(content):
+                if previous is not None:
+                    record = self._build_record(content, previous, match.start(), string_pool)
+                    if record:
+                        yield record
+                previous = match
+            
+            # 最后一条记录的地址块延伸到文件末尾
+            if previous is not None:
+                record = self._build_record(content, previous, len(content), string_pool)
+                if record:
+                    yield record
+    
+    @staticmethod
+    def _build_record(content, match, block_end: int, string_pool: Dict[str, str]) -> Optional[Tuple[str, str, str]]:
+        """根据记录行及其后的地址块构造一条记录，厂商名称为空时返回None"""
+        vendor_name = match.group(2).decode('utf-8', errors='ignore').strip()
+        if not vendor_name:
+            return None
         
-        return oui_records
+        block = content[match.end():block_end].decode('utf-8', errors='ignore')
+        # base 16记录行（如 "286FB9     (base 16)		Nokia Shanghai Bell Co., Ltd."）只是重复厂商名称，跳过
+        # 每行只strip一次（map在C层完成），空行和 base 16 行直接跳过
+        address_lines = [
+            line
+            for line in map(str.strip, block.splitlines())
+            if line and '(base 16)' not in line
+        ]
+        address = '\n'.join(address_lines)
+        return (
+            match.group(1).decode('ascii').replace('-', ''),  # 移除连字符，统一格式
+            string_pool.setdefault(vendor_name, vendor_name),
+            string_pool.setdefault(address, address),
+        )
     
-    def _load_cache(self) -> Dict[str, Dict[str, str]]:
+    def parse_oui_file(self) -> List[Tuple[str, str, str]]:
+        """解析OUI文件，返回(oui, vendor_name, vendor_address)的列表（保持原有接口兼容性）"""
+        return list(self.iter_oui_records())
+    
+    def _load_cache(self) -> Dict[int, Dict[str, str]]:
         """加载OUI缓存"""
         if self._oui_cache is not None:
             return self._oui_cache
         
+        with self._load_lock:
+            if self._oui_cache is None:
+                self._read_cache_file()
+        return self._oui_cache if self._oui_cache is not None else {}
+    
+    def load(self) -> int:
+        """预先把已有的OUI缓存加载进内存（不导入OUI文件），返回缓存的记录数"""
+        return len(self._load_cache())
+    
+    def _read_cache_file(self):
+        """读取缓存文件到内存"""
+        # 缓存使用 marshal 格式，直接反序列化为字典，比解析JSON快一倍左右。
+        # 缓存文件不存在或不完整（可能正由其他进程导入）时不记住空结果，下次查询再尝试加载
         try:
-            if self.cache_file_path.exists():
-                with open(self.cache_file_path, 'r', encoding='utf-8') as f:
-                    self._oui_cache = json.load(f)
-            else:
-                self._oui_cache = {}
-        except (FileNotFoundError, json.JSONDecodeError):
-            self._oui_cache = {}
-        
-        return self._oui_cache
+            cache_data = marshal.loads(self.cache_file_path.read_bytes())
+        except (FileNotFoundError, EOFError, ValueError, TypeError):
+            return
+        # 旧版本缓存以6位十六进制字符串为键，视为不存在，由启动时重新导入
+        if isinstance(cache_data, dict) and all(isinstance(key, int) for key in cache_data):
+            self._oui_cache = cache_data
     
-    def _save_cache(self, cache_data: Dict[str, Dict[str, str]]):
-        """保存OUI缓存"""
+    def _save_cache(self, cache_data: Dict[int, Dict[str, str]]):
+        """保存OUI缓存（一次性紧凑写入临时文件后原子替换，其他进程不会读到写了一半的缓存）"""
         try:
-            with open(self.cache_file_path, 'w', encoding='utf-8') as f:
-                json.dump(cache_data, f, ensure_ascii=False, indent=2)
+            tmp_path = self.cache_file_path.with_suffix('.tmp')
+            tmp_path.write_bytes(marshal.dumps(cache_data))
+            os.replace(tmp_path, self.cache_file_path)
             self._oui_cache = cache_data
         except Exception as e:
             print(f"Error saving OUI cache: {e}")
@@ -104,17 +146,12 @@ class OuiParser:
         
         print("Parsing OUI file...")
         try:
-            oui_records = self.parse_oui_file()
-            print(f"Found {len(oui_records)} OUI records")
-            
-            print("Building cache...")
-            cache_data = {}
-            
-            for oui, vendor_name, vendor_address in oui_records:
-                cache_data[oui] = {
-                    'vendor_name': vendor_name,
-                    'vendor_address': vendor_address
-                }
+            # 边解析边构建，整表一次写入，不保留中间的记录列表。
+            # 键使用24位整数而不是6位十六进制字符串，占用内存更小
+            cache_data = {
+                int(oui, 16): {'vendor_name': vendor_name, 'vendor_address': vendor_address}
+                for oui, vendor_name, vendor_address in self.iter_oui_records()
+            }
             
             # 保存到缓存文件
             self._save_cache(cache_data)
@@ -131,7 +168,9 @@ class OuiParser:
             return None
         
         # 提取OUI (前6位)
-        oui = mac_address.replace(':', '').replace('-', '').upper()[:6]
+        oui = extract_oui(mac_address)
+        if oui is None:
+            return None
         
         # 加载缓存
         cache = self._load_cache()
@@ -146,7 +185,9 @@ class OuiParser:
             return None
         
         # 提取OUI (前6位)
-        oui = mac_address.replace(':', '').replace('-', '').upper()[:6]
+        oui = extract_oui(mac_address)
+        if oui is None:
+            return None
         
         # 加载缓存
         cache = self._load_cache()
@@ -162,10 +203,9 @@ class OuiParser:
             'cache_size_bytes': self.cache_file_path.stat().st_size if self.cache_file_path.exists() else 0
         }
 
-def init_oui_database():
-    """初始化OUI缓存"""
-    parser = OuiParser()
-    return parser.import_to_cache()
-
 # 创建全局实例
-oui_parser = OuiParser() 
\ No newline at end of file
+oui_parser = OuiParser()
+
+def init_oui_database():
+    """初始化OUI缓存（使用全局实例，启动时即把OUI表加载进内存，查询时不再读取文件）"""
+    return oui_parser.import_to_cache()
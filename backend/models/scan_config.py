@@ -1,16 +1,54 @@
-from dataclasses import dataclass, field
-from typing import List, Optional
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
 import ipaddress
+import re
 
 
-@dataclass
-class ScanConfig:
+# 支持的ping方法（验证时使用集合做成员判断）
+VALID_PING_METHODS = ("icmp", "tcp_syn", "tcp_ack", "udp")
+_VALID_PING_METHODS = frozenset(VALID_PING_METHODS)
+
+# 超时时间格式，如 "3s"、"1.5m"
+TIMEOUT_PATTERN = re.compile(r"^\d+(?:\.\d+)?[smh]?$")
+
+
+# 存为元组的列表型配置字段，赋值时转换，不能原地修改
+TUPLE_FIELDS = frozenset(("exclude_ips", "ping_methods", "tcp_ping_ports", "ack_ping_ports"))
+
+# 决定nmap参数前缀（除扫描目标外的参数）的配置字段
+NMAP_ARGS_FIELDS = frozenset(
+    ("ping_methods", "tcp_ping_ports", "ack_ping_ports", "max_retries", "scan_rate", "scan_timeout")
+)
+
+
+class _ScanConfigCache:
+    """ScanConfig 的派生数据缓存槽位（不是配置字段，不参与序列化和比较）
+
+    字段被重新赋值时丢弃对应的缓存；TUPLE_FIELDS 中的字段赋值时转为元组，
+    只能整体赋值（如配置管理工具的 set 命令），缓存不会因原地修改而过期。
+    """
+
+    __slots__ = ("_nmap_args_prefix", "_exclude_set")
+
+    def __setattr__(self, name, value):
+        if name in TUPLE_FIELDS:
+            value = tuple(value)
+        object.__setattr__(self, name, value)
+        if name == "exclude_ips":
+            object.__setattr__(self, "_exclude_set", None)
+        elif name in NMAP_ARGS_FIELDS:
+            object.__setattr__(self, "_nmap_args_prefix", None)
+
+
+# 使用 __slots__ 存储字段，实例更小、属性访问更快
+@dataclass(slots=True)
+class ScanConfig(_ScanConfigCache):
     """扫描配置类"""
 
     # 网络配置
     subnet_cidr: Optional[str] = None  # 手动指定子网，如 "192.168.1.0/24"
     auto_detect_subnet: bool = True  # 自动检测子网
-    exclude_ips: List[str] = field(default_factory=list)  # 排除的IP地址
+    exclude_ips: Tuple[str, ...] = ()  # 排除的IP地址
 
     # 性能参数
     scan_rate: int = 100  # nmap扫描速率 (packets/second)
@@ -25,11 +63,9 @@ class ScanConfig:
     fallback_enabled: bool = True  # 是否启用降级扫描方法
 
     # 高级选项
-    ping_methods: List[str] = field(default_factory=lambda: ["icmp"])  # ping方法
-    tcp_ping_ports: List[int] = field(
-        default_factory=lambda: [22, 80, 443]
-    )  # TCP ping端口
-    ack_ping_ports: List[int] = field(default_factory=lambda: [80])  # ACK ping端口
+    ping_methods: Tuple[str, ...] = ("icmp",)  # ping方法
+    tcp_ping_ports: Tuple[int, ...] = (22, 80, 443)  # TCP ping端口
+    ack_ping_ports: Tuple[int, ...] = (80,)  # ACK ping端口
 
     # 扫描类型配置
     enable_port_scan: bool = False  # 是否启用端口扫描
@@ -48,12 +84,8 @@ class ScanConfig:
             except ValueError:
                 raise ValueError(f"无效的子网CIDR格式: {self.subnet_cidr}")
 
-        # 验证排除IP格式
-        for ip in self.exclude_ips:
-            try:
-                ipaddress.IPv4Address(ip)
-            except ValueError:
-                raise ValueError(f"无效的IP地址: {ip}")
+        # 验证排除IP格式，同时生成扫描时使用的排除集合
+        self._exclude_set = self._build_exclude_set()
 
         # 验证数值范围
         if not 1 <= self.scan_rate <= 1000:
@@ -70,10 +102,9 @@ class ScanConfig:
             raise ValueError(f"无效的超时格式: {self.scan_timeout}")
 
         # 验证ping方法
-        valid_methods = ["icmp", "tcp_syn", "tcp_ack", "udp"]
         for method in self.ping_methods:
-            if method not in valid_methods:
-                raise ValueError(f"无效的ping方法: {method}. 支持: {valid_methods}")
+            if method not in _VALID_PING_METHODS:
+                raise ValueError(f"无效的ping方法: {method}. 支持: {list(VALID_PING_METHODS)}")
 
         # 验证端口列表
         for port in self.tcp_ping_ports + self.ack_ping_ports:
@@ -82,13 +113,23 @@ class ScanConfig:
 
     def _validate_timeout_format(self, timeout: str) -> bool:
         """验证超时格式"""
-        import re
-
-        pattern = r"^\d+(?:\.\d+)?[smh]?$"
-        return bool(re.match(pattern, timeout))
+        return bool(TIMEOUT_PATTERN.match(timeout))
 
     def get_nmap_args(self, target: str) -> List[str]:
         """根据配置生成nmap参数"""
+        # 除目标外的参数只取决于 NMAP_ARGS_FIELDS 中的字段，逐主机扫描时复用已生成的参数前缀；
+        # 其中的列表字段存为元组不能原地修改，字段被重新赋值时（如配置管理工具的 set 命令）
+        # 前缀被丢弃，下次调用时重新生成
+        prefix = getattr(self, "_nmap_args_prefix", None)
+        if prefix is None:
+            prefix = tuple(self._build_nmap_args_prefix())
+            self._nmap_args_prefix = prefix
+
+        # 目标
+        return [*prefix, target]
+
+    def _build_nmap_args_prefix(self) -> List[str]:
+        """生成除扫描目标外的nmap参数"""
         args = []
 
         # 基础ping扫描参数
@@ -117,14 +158,32 @@ class ScanConfig:
         # 输出格式
         args.extend(["-oX", "-"])  # XML输出到stdout
 
-        # 目标
-        args.append(target)
-
         return args
 
+    def _build_exclude_set(self) -> frozenset:
+        """把排除列表一次解析为IPv4地址整数集合，遇到无效地址立即报错"""
+        exclude_set = set()
+        for ip in self.exclude_ips:
+            try:
+                exclude_set.add(int(ipaddress.IPv4Address(ip)))
+            except ValueError:
+                raise ValueError(f"无效的IP地址: {ip}")
+        return frozenset(exclude_set)
+
     def should_exclude_ip(self, ip: str) -> bool:
         """检查IP是否应该被排除"""
-        return ip in self.exclude_ips
+        # 扫描时每个主机都会检查一次，按地址整数在集合中做O(1)查找（不受写法差异影响）；
+        # 排除列表被重新赋值时集合被丢弃，下次检查时重新生成
+        exclude_set = getattr(self, "_exclude_set", None)
+        if exclude_set is None:
+            exclude_set = self._build_exclude_set()
+            self._exclude_set = exclude_set
+        if not exclude_set:
+            return False
+        try:
+            return int(ipaddress.IPv4Address(ip)) in exclude_set
+        except ValueError:
+            return False
 
     def get_effective_subnet(self, detected_subnet: str) -> str:
         """获取有效的扫描子网"""
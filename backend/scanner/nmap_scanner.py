@@ -1,13 +1,90 @@
 import asyncio
+import atexit
+import os
+import shutil
 import subprocess
+import threading
+import time
 import json
-import xml.etree.ElementTree as ET
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Tuple
 from datetime import datetime
 from dataclasses import dataclass, field
 import ipaddress
 
-@dataclass
+from scanner.nmap_xml import (
+    HOSTGROUP_ARGS,
+    NmapCommandError,
+    index_host_element,
+    iter_open_ports,
+    online_targets,
+    stream_nmap_hosts,
+    targets_input,
+)
+
+# 设备类型推断使用的端口/服务特征集合
+WEB_PORTS = frozenset({80, 443, 8080})
+WEB_SERVICES = frozenset({'http', 'https'})
+ROUTER_PORTS = frozenset({22, 23, 53})
+PRINTER_PORTS = frozenset({515, 631, 9100})
+FILE_SERVER_PORTS = frozenset({139, 445, 548, 2049})
+CAMERA_PORTS = frozenset({554, 8080, 80})
+CAMERA_SERVICES = frozenset({'rtsp'})
+REMOTE_ACCESS_PORTS = frozenset({22, 3389})
+LINUX_OS_KEYWORDS = ('linux', 'unix', 'ubuntu', 'centos')
+
+# 规则中出现的端口/服务各占一个二进制位，推断时把设备的端口和服务各折叠成一个整数掩码
+PORT_BITS = {
+    port: 1 << i
+    for i, port in enumerate(sorted(
+        WEB_PORTS | ROUTER_PORTS | PRINTER_PORTS | FILE_SERVER_PORTS | CAMERA_PORTS | REMOTE_ACCESS_PORTS
+    ))
+}
+SERVICE_BITS = {name: 1 << i for i, name in enumerate(sorted(WEB_SERVICES | CAMERA_SERVICES))}
+
+
+def _mask(values, bits: Dict[Any, int]) -> int:
+    """把一组端口或服务名折叠为位掩码，不在规则中出现的值忽略"""
+    mask = 0
+    for value in values:
+        mask |= bits.get(value, 0)
+    return mask
+
+
+@dataclass(frozen=True, slots=True)
+class DeviceTypeRule:
+    """设备类型推断规则：port_groups 中每组端口都至少开放一个，且（如有要求）至少有一个指定服务时命中"""
+    device_type: str
+    port_groups: Tuple[int, ...]
+    service_mask: int = 0
+
+    def matches(self, port_mask: int, service_mask: int) -> bool:
+        if self.service_mask and not (service_mask & self.service_mask):
+            return False
+        for group in self.port_groups:
+            if not (port_mask & group):
+                return False
+        return True
+
+
+# 按顺序匹配，第一个命中的规则决定设备类型
+DEVICE_TYPE_RULES = (
+    DeviceTypeRule("Router/Gateway", (_mask(WEB_PORTS, PORT_BITS), _mask(ROUTER_PORTS, PORT_BITS)), _mask(WEB_SERVICES, SERVICE_BITS)),
+    DeviceTypeRule("Network Printer", (_mask(PRINTER_PORTS, PORT_BITS),)),
+    DeviceTypeRule("NAS/File Server", (_mask(FILE_SERVER_PORTS, PORT_BITS),)),
+    DeviceTypeRule("IP Camera", (_mask(CAMERA_PORTS, PORT_BITS),), _mask(CAMERA_SERVICES, SERVICE_BITS)),
+    # 计算机/服务器，命中后再根据操作系统信息细分
+    DeviceTypeRule("Computer", (_mask(REMOTE_ACCESS_PORTS, PORT_BITS),)),
+)
+
+# docker exec 自身出错（而不是容器中的nmap出错）时的退出码和错误信息，
+# 出现这些时认为常驻容器已不可用
+DOCKER_EXEC_ERROR_CODES = (125, 126, 127)
+DOCKER_CONTAINER_GONE_MESSAGES = ("No such container", "is not running")
+
+# 做过操作系统/服务版本识别的设备，在这段时间内的综合扫描只扫描端口（秒）
+FINGERPRINT_MAX_AGE = 7 * 24 * 3600
+
+@dataclass(slots=True)
 class ServiceInfo:
     port: int
     protocol: str
@@ -15,7 +92,7 @@ class ServiceInfo:
     version: Optional[str] = None
     state: str = "unknown"
 
-@dataclass  
+@dataclass(slots=True)
 class DeviceInfo:
     ip: str
     mac: Optional[str] = None
@@ -34,32 +111,95 @@ class NmapScanner:
     def __init__(self, docker_image: str = "instrumentisto/nmap:latest"):
         self.docker_image = docker_image
         self.docker_available = self._check_docker()
+        # 常驻的nmap容器，首次扫描时启动，之后每次扫描用 docker exec 执行，
+        # 省去每次 docker run 创建容器的开销（每个进程一个容器，避免多worker重名）
+        self._container_name: Optional[str] = None
+        self._container_lock = threading.Lock()
+        # 运行nmap的命令前缀，确定后缓存，每次扫描只需拼接nmap参数；
+        # 使用Docker时在常驻容器启动后才确定
+        self._cmd_prefix: Optional[Tuple[str, ...]] = None if self.docker_available else ('nmap',)
+        # 综合扫描中已识别过的设备: MAC -> (识别时间, 操作系统信息)
+        self._fingerprints: Dict[str, Tuple[float, Optional[str]]] = {}
     
     def _check_docker(self) -> bool:
-        """检查Docker是否可用"""
+        """检查Docker是否可用（只在PATH中查找docker命令，不在导入时启动子进程）"""
+        return shutil.which('docker') is not None
+    
+    def _ensure_container(self) -> Optional[str]:
+        """启动常驻nmap容器（已启动则直接返回），启动失败时返回None"""
+        with self._container_lock:
+            if self._container_name is not None:
+                return self._container_name
+            
+            name = f"lan-watcher-nmap-{os.getpid()}"
+            try:
+                # 清理同名的残留容器（进程号被复用时）
+                subprocess.run(['docker', 'rm', '-f', name], capture_output=True, timeout=30)
+                result = subprocess.run(
+                    [
+                        'docker', 'run', '-d', '--rm', '--network=host',
+                        '--name', name, '--entrypoint', 'sleep',
+                        self.docker_image, 'infinity'
+                    ],
+                    capture_output=True,
+                    text=True,
+                    timeout=300  # 首次使用时可能需要拉取镜像
+                )
+            except Exception as e:
+                print(f"启动nmap容器失败: {e}")
+                return None
+            
+            if result.returncode != 0:
+                print(f"启动nmap容器失败: {result.stderr.strip()}")
+                return None
+            
+            self._container_name = name
+            # 在常驻容器中执行（-i 保持标准输入，供 -iL - 读取目标列表）
+            self._cmd_prefix = ('docker', 'exec', '-i', name, 'nmap')
+            atexit.register(self._stop_container, name)
+            return name
+    
+    def _stop_container(self, name: str):
+        """停止并删除常驻nmap容器"""
+        with self._container_lock:
+            if self._container_name == name:
+                self._container_name = None
+                self._cmd_prefix = None
         try:
-            result = subprocess.run(
-                ['docker', '--version'], 
-                capture_output=True, 
-                text=True,
-                timeout=5
-            )
-            return result.returncode == 0
+            subprocess.run(['docker', 'rm', '-f', name], capture_output=True, timeout=30)
         except Exception:
-            return False
+            pass
+    
+    async def _nmap_command(self, nmap_args: List[str]) -> List[str]:
+        """生成运行nmap的完整命令"""
+        prefix = self._cmd_prefix
+        if prefix is None:
+            # 常驻容器尚未启动（或已失效），启动成功后缓存 docker exec 前缀
+            await asyncio.to_thread(self._ensure_container)
+            prefix = self._cmd_prefix
+            if prefix is None:
+                # 容器无法常驻时，本次扫描单独运行一个容器（下次扫描再尝试启动常驻容器）
+                prefix = ('docker', 'run', '--rm', '-i', '--network=host', self.docker_image)
+        return [*prefix, *nmap_args]
+    
+    async def _on_nmap_failure(self, cmd: List[str], error: Exception):
+        """nmap执行失败时，如果是docker报告常驻容器已不可用，则清理该容器，下次扫描重新启动；
+        nmap自身的失败（如目标无效、权限不足）不影响同一容器中正在进行的其他扫描"""
+        if cmd[:2] != ['docker', 'exec'] or not isinstance(error, NmapCommandError):
+            return
+        if error.returncode in DOCKER_EXEC_ERROR_CODES or any(
+            message in error.stderr for message in DOCKER_CONTAINER_GONE_MESSAGES
+        ):
+            await asyncio.to_thread(self._stop_container, cmd[3])
     
     async def _run_nmap_command(self, nmap_args: List[str]) -> str:
         """运行nmap命令"""
-        if self.docker_available:
-            # 使用Docker运行nmap
-            cmd = ['docker', 'run', '--rm', '--network=host', self.docker_image] + nmap_args
-        else:
-            # 降级到本地nmap（如果有的话）
-            cmd = ['nmap'] + nmap_args
+        cmd = await self._nmap_command(nmap_args)
         
         try:
             process = await asyncio.create_subprocess_exec(
                 *cmd,
+                stdin=asyncio.subprocess.DEVNULL,
                 stdout=asyncio.subprocess.PIPE,
                 stderr=asyncio.subprocess.PIPE
             )
@@ -67,13 +207,33 @@ class NmapScanner:
             stdout, stderr = await process.communicate()
             
             if process.returncode != 0:
-                raise Exception(f"Nmap command failed: {stderr.decode()}")
+                raise NmapCommandError(process.returncode, stderr.decode(errors="replace"))
             
             return stdout.decode()
         
         except Exception as e:
+            await self._on_nmap_failure(cmd, e)
             raise Exception(f"Failed to run nmap: {str(e)}")
     
+    async def _run_nmap_scan(self, nmap_args: List[str], stdin_data: Optional[bytes] = None) -> List[DeviceInfo]:
+        """运行输出XML的nmap扫描，边从管道读取边解析，不缓存完整输出"""
+        devices = []
+        cmd = await self._nmap_command(nmap_args)
+        try:
+            async for host in stream_nmap_hosts(cmd, stdin_data):
+                try:
+                    device = self._parse_host_element(host)
+                except Exception as e:
+                    print(f"解析nmap输出时出错: {e}")
+                    continue
+                if device:
+                    devices.append(device)
+        except Exception as e:
+            await self._on_nmap_failure(cmd, e)
+            raise Exception(f"Failed to run nmap: {str(e)}")
+        
+        return devices
+    
     async def ping_sweep(self, subnet: str) -> List[DeviceInfo]:
         """快速主机发现扫描"""
         nmap_args = [
@@ -87,32 +247,38 @@ class NmapScanner:
             subnet
         ]
         
-        output = await self._run_nmap_command(nmap_args)
-        return self._parse_xml_output(output)
+        return await self._run_nmap_scan(nmap_args)
     
-    async def port_scan(self, targets: List[str], ports: str = "1-1000") -> List[DeviceInfo]:
-        """端口扫描"""
+    async def port_scan(self, targets: List[str], ports: str = "1-1000", fingerprint: bool = True) -> List[DeviceInfo]:
+        """端口扫描，fingerprint为False时跳过服务版本和操作系统识别，只做SYN端口扫描"""
         if not targets:
             return []
         
-        target_str = ','.join(targets)
-        nmap_args = [
-            '-sS',  # TCP SYN扫描
-            '-sV',  # 服务版本检测
-            '-O',   # 操作系统检测
-            '--version-intensity', '5',
+        # 目标通过标准输入一次性传给nmap（-iL -），由nmap自己并行调度所有主机
+        nmap_args = ['-sS']  # TCP SYN扫描
+        if fingerprint:
+            nmap_args += [
+                '-sV',  # 服务版本检测
+                '-O',   # 操作系统检测
+                '--version-intensity', '5',
+            ]
+        nmap_args += [
             '-p', ports,
             '--min-rate', '500',
             '--max-retries', '2',
+            *HOSTGROUP_ARGS,
             '-oX', '-',
-            target_str
+            '-iL', '-'
         ]
         
-        output = await self._run_nmap_command(nmap_args)
-        return self._parse_xml_output(output)
+        return await self._run_nmap_scan(nmap_args, targets_input(targets))
     
     async def comprehensive_scan(self, subnet: str) -> List[DeviceInfo]:
-        """综合扫描：主机发现 + 端口扫描 + 服务识别"""
+        """综合扫描：主机发现 + 端口扫描 + 服务识别
+        
+        最近一周内已识别过的设备只做端口扫描，沿用上次识别的操作系统信息；
+        新设备才进行服务版本和操作系统识别（-sV -O）。
+        """
         # 第一步：快速主机发现
         print(f"正在发现子网 {subnet} 中的活跃主机...")
         devices = await self.ping_sweep(subnet)
@@ -120,20 +286,48 @@ class NmapScanner:
         if not devices:
             return []
         
-        # 第二步：对发现的主机进行详细扫描
-        active_ips = [d.ip for d in devices if d.is_online]
-        print(f"发现 {len(active_ips)} 个活跃主机，开始详细扫描...")
-        
-        # 分批扫描避免超时
-        batch_size = 10
-        detailed_devices = []
-        
-        for i in range(0, len(active_ips), batch_size):
-            batch = active_ips[i:i + batch_size]
-            batch_results = await self.port_scan(batch, "1-1000,8080,8443,9000")
-            detailed_devices.extend(batch_results)
-        
-        return detailed_devices
+        # 第二步：按设备是否已识别分组（顺带清除过期的识别记录，避免长期运行时无限增长）
+        now = time.monotonic()
+        self._fingerprints = {
+            mac: fingerprint for mac, fingerprint in self._fingerprints.items()
+            if now - fingerprint[0] < FINGERPRINT_MAX_AGE
+        }
+        macs = {d.ip: d.mac.upper() for d in devices if d.mac}
+        full_ips = []
+        quick_ips = []
+        for ip in online_targets(devices):
+            mac = macs.get(ip)
+            if mac and mac in self._fingerprints:
+                quick_ips.append(ip)
+            else:
+                full_ips.append(ip)
+        print(f"发现 {len(full_ips) + len(quick_ips)} 个活跃主机，开始详细扫描（{len(quick_ips)} 个已识别设备只扫描端口）...")
+        
+        # 每组主机在一次nmap调用中扫描，由nmap按主机组并行；两组同时进行
+        ports = "1-1000,8080,8443,9000"
+        full_task = asyncio.create_task(self.port_scan(full_ips, ports))
+        quick_task = asyncio.create_task(self.port_scan(quick_ips, ports, fingerprint=False))
+        try:
+            full_devices, quick_devices = await asyncio.gather(full_task, quick_task)
+        except BaseException:
+            # 一组失败或扫描被取消时终止另一组，避免留下无人等待的nmap进程
+            for task in (full_task, quick_task):
+                task.cancel()
+            await asyncio.gather(full_task, quick_task, return_exceptions=True)
+            raise
+        
+        # 记录新识别的设备，已识别设备沿用上次的操作系统信息重新推断类型
+        for device in full_devices:
+            mac = macs.get(device.ip) or (device.mac.upper() if device.mac else None)
+            if mac:
+                self._fingerprints[mac] = (now, device.os_info)
+        for device in quick_devices:
+            fingerprint = self._fingerprints.get(macs.get(device.ip))
+            if fingerprint and not device.os_info:
+                device.os_info = fingerprint[1]
+                device.device_type = self._infer_device_type(device.services, device.os_info, frozenset(device.open_ports))
+        
+        return full_devices + quick_devices
     
     async def service_discovery(self, target: str) -> DeviceInfo:
         """深度服务发现扫描"""
@@ -149,38 +343,20 @@ class NmapScanner:
             target
         ]
         
-        output = await self._run_nmap_command(nmap_args)
-        devices = self._parse_xml_output(output)
+        devices = await self._run_nmap_scan(nmap_args)
         return devices[0] if devices else None
     
-    def _parse_xml_output(self, xml_output: str) -> List[DeviceInfo]:
-        """解析nmap XML输出"""
-        devices = []
-        
-        try:
-            root = ET.fromstring(xml_output)
-            
-            for host in root.findall('host'):
-                device = self._parse_host_element(host)
-                if device:
-                    devices.append(device)
-        
-        except ET.ParseError as e:
-            print(f"XML解析错误: {e}")
-        except Exception as e:
-            print(f"解析nmap输出时出错: {e}")
-        
-        return devices
-    
     def _parse_host_element(self, host_element) -> Optional[DeviceInfo]:
         """解析单个主机元素"""
+        # 一次遍历取出所有需要的子元素
+        children, address_elements = index_host_element(host_element)
+        
         # 获取状态
-        status = host_element.find('status')
+        status = children.get('status')
         if status is None or status.get('state') != 'up':
             return None
         
         # 获取IP地址
-        address_elements = host_element.findall('address')
         ip = None
         mac = None
         vendor = None
@@ -197,7 +373,7 @@ class NmapScanner:
         
         # 获取主机名
         hostname = None
-        hostnames = host_element.find('hostnames')
+        hostnames = children.get('hostnames')
         if hostnames is not None:
             hostname_elem = hostnames.find('hostname')
             if hostname_elem is not None:
@@ -205,7 +381,7 @@ class NmapScanner:
         
         # 获取响应时间
         response_time = None
-        times = host_element.find('times')
+        times = children.get('times')
         if times is not None:
             rtt = times.get('rttvar')
             if rtt:
@@ -214,39 +390,34 @@ class NmapScanner:
         # 解析端口和服务信息
         services = []
         open_ports = []
-        ports_element = host_element.find('ports')
+        ports_element = children.get('ports')
         
         if ports_element is not None:
-            for port in ports_element.findall('port'):
+            for port, service_elem in iter_open_ports(ports_element):
                 port_num = int(port.get('portid'))
-                protocol = port.get('protocol')
+                open_ports.append(port_num)
                 
-                state_elem = port.find('state')
-                if state_elem is not None and state_elem.get('state') == 'open':
-                    open_ports.append(port_num)
-                    
-                    # 获取服务信息
-                    service_elem = port.find('service')
-                    if service_elem is not None:
-                        service_info = ServiceInfo(
-                            port=port_num,
-                            protocol=protocol,
-                            service=service_elem.get('name', 'unknown'),
-                            version=service_elem.get('version'),
-                            state='open'
-                        )
-                        services.append(service_info)
+                # 获取服务信息
+                if service_elem is not None:
+                    service_info = ServiceInfo(
+                        port=port_num,
+                        protocol=port.get('protocol'),
+                        service=service_elem.get('name', 'unknown'),
+                        version=service_elem.get('version'),
+                        state='open'
+                    )
+                    services.append(service_info)
         
         # 获取操作系统信息
         os_info = None
-        os_element = host_element.find('os')
+        os_element = children.get('os')
         if os_element is not None:
             osmatch = os_element.find('osmatch')
             if osmatch is not None:
                 os_info = osmatch.get('name')
         
         # 推断设备类型
-        device_type = self._infer_device_type(services, os_info, open_ports)
+        device_type = self._infer_device_type(services, os_info, frozenset(open_ports))
         
         return DeviceInfo(
             ip=ip,
@@ -261,41 +432,26 @@ class NmapScanner:
             device_type=device_type
         )
     
-    def _infer_device_type(self, services: List[ServiceInfo], os_info: Optional[str], open_ports: List[int]) -> Optional[str]:
+    def _infer_device_type(self, services: List[ServiceInfo], os_info: Optional[str], open_ports: frozenset) -> Optional[str]:
         """根据服务和端口推断设备类型"""
         if not services and not open_ports:
             return None
         
         # 基于端口和服务的设备类型推断
-        service_names = [s.service.lower() for s in services]
-        
-        # 路由器/网关
-        if any(port in open_ports for port in [80, 443, 8080]) and any(s in service_names for s in ['http', 'https']):
-            if any(port in open_ports for port in [22, 23, 53]):
-                return "Router/Gateway"
-        
-        # 网络打印机
-        if any(port in open_ports for port in [515, 631, 9100]):
-            return "Network Printer"
-        
-        # NAS/文件服务器
-        if any(port in open_ports for port in [139, 445, 548, 2049]):
-            return "NAS/File Server"
-        
-        # IP摄像头
-        if any(port in open_ports for port in [554, 8080, 80]) and 'rtsp' in service_names:
-            return "IP Camera"
-        
-        # 计算机/服务器
-        if 22 in open_ports or 3389 in open_ports:
-            if os_info:
-                if 'windows' in os_info.lower():
-                    return "Windows Computer"
-                elif any(os in os_info.lower() for os in ['linux', 'unix', 'ubuntu', 'centos']):
-                    return "Linux Computer"
-                elif 'mac' in os_info.lower():
-                    return "Mac Computer"
-            return "Computer"
+        port_mask = _mask(open_ports, PORT_BITS)
+        service_mask = _mask((s.service.lower() for s in services), SERVICE_BITS)
+        
+        for rule in DEVICE_TYPE_RULES:
+            if rule.matches(port_mask, service_mask):
+                if rule.device_type == "Computer" and os_info:
+                    os_lower = os_info.lower()
+                    if 'windows' in os_lower:
+                        return "Windows Computer"
+                    elif any(os in os_lower for os in LINUX_OS_KEYWORDS):
+                        return "Linux Computer"
+                    elif 'mac' in os_lower:
+                        return "Mac Computer"
+                return rule.device_type
         
         # 移动设备（基于端口特征）
         if len(open_ports) <= 2 and any(port > 1024 for port in open_ports):
@@ -0,0 +1,162 @@
+"""
+nmap XML输出的增量解析
+逐个产出 <host> 元素，处理完的主机立即从文档树中移除，不在内存中保留完整的XML树
+"""
+
+import asyncio
+import ipaddress
+import xml.etree.ElementTree as ET
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# 每次从nmap输出管道读取并喂给解析器的字节数
+XML_CHUNK_SIZE = 64 * 1024
+
+# 多目标扫描时让nmap自己按主机组并行调度，代替在Python中分小批多次启动nmap
+HOSTGROUP_ARGS = ["--min-hostgroup", "64", "--max-hostgroup", "256"]
+
+
+class NmapCommandError(Exception):
+    """nmap进程以非零状态退出"""
+
+    def __init__(self, returncode: int, stderr: str):
+        super().__init__(f"Nmap command failed: {stderr}")
+        self.returncode = returncode
+        self.stderr = stderr
+
+
+def online_targets(devices: Iterable) -> List[str]:
+    """取出在线设备的IP，去重并按地址排序
+    重复的IP会让nmap对同一主机重复做完整扫描；连续的地址也便于nmap按主机组调度"""
+    ips = dict.fromkeys(device.ip for device in devices if device.is_online)
+    return sorted(ips, key=_address_sort_key)
+
+
+def _address_sort_key(ip: str):
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        # 非IP地址的目标（如主机名）排在最后
+        return (7, 0, ip)
+    return (address.version, int(address), ip)
+
+
+def targets_input(targets: List[str]) -> bytes:
+    """把目标列表编码为 -iL - 读取的标准输入内容（每行一个目标）"""
+    return "\n".join(targets).encode() + b"\n"
+
+
+def index_host_element(host_element: ET.Element) -> Tuple[Dict[str, ET.Element], List[ET.Element]]:
+    """一次遍历 <host> 的子元素，返回 (标签 -> 该标签的第一个子元素, 所有 <address> 子元素)
+    代替对同一主机多次调用 find/findall（每次都要解析路径并从头查找子元素）"""
+    children = {}
+    addresses = []
+    for child in host_element:
+        if child.tag == "address":
+            addresses.append(child)
+        elif child.tag not in children:
+            children[child.tag] = child
+    return children, addresses
+
+
+def iter_open_ports(ports_element: ET.Element) -> Iterator[Tuple[ET.Element, Optional[ET.Element]]]:
+    """遍历 <ports> 中状态为open的端口，产出 (<port>元素, <service>元素或None)"""
+    for port in ports_element:
+        if port.tag != "port":
+            continue
+        state = service = None
+        for child in port:
+            if child.tag == "state":
+                state = child
+            elif child.tag == "service":
+                service = child
+        if state is not None and state.get("state") == "open":
+            yield port, service
+
+
+class NmapHostParser:
+    """nmap XML的增量解析器，数据可以分块多次喂入（如直接来自nmap进程的输出管道）"""
+
+    def __init__(self):
+        self._parser = ET.XMLPullParser(events=("start", "end"))
+        self._root = None
+
+    def feed(self, data) -> Iterator[ET.Element]:
+        """喂入一块XML数据，产出这块数据中已完整解析的 <host> 元素"""
+        self._parser.feed(data)
+        return self._read_hosts()
+
+    def close(self) -> Iterator[ET.Element]:
+        """结束输入，产出剩余的 <host> 元素（文档不完整时抛出 ET.ParseError）"""
+        self._parser.close()
+        return self._read_hosts()
+
+    def _read_hosts(self) -> Iterator[ET.Element]:
+        for event, element in self._parser.read_events():
+            if event == "start":
+                if self._root is None:
+                    self._root = element
+                continue
+            if element.tag != "host":
+                continue
+            yield element
+            # 调用方处理完后从根元素移除，释放已解析主机占用的内存
+            try:
+                self._root.remove(element)
+            except ValueError:
+                # 不是根元素的直接子元素
+                pass
+
+
+async def stream_nmap_hosts(cmd: List[str], stdin_data: Optional[bytes] = None) -> AsyncIterator[ET.Element]:
+    """运行nmap命令（需带 -oX -），边从输出管道读取边解析，nmap发现一个主机就产出一个 <host> 元素
+
+    stdin_data 会写入nmap的标准输入（配合 -iL - 传入目标列表）。
+    进程失败时在产出所有已解析主机后抛出异常；XML解析错误会打印出来，并继续读完输出让进程正常退出。
+    """
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdin=asyncio.subprocess.PIPE if stdin_data is not None else asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    if stdin_data is not None:
+        process.stdin.write(stdin_data)
+        await process.stdin.drain()
+        process.stdin.close()
+    # 同时读取stderr，避免其管道写满阻塞nmap
+    stderr_task = asyncio.create_task(process.stderr.read())
+    parser = NmapHostParser()
+    parse_failed = False
+
+    try:
+        while True:
+            chunk = await process.stdout.read(XML_CHUNK_SIZE)
+            if not chunk:
+                break
+            if parse_failed:
+                continue
+            try:
+                for host in parser.feed(chunk):
+                    yield host
+            except ET.ParseError as e:
+                print(f"XML解析错误: {e}")
+                parse_failed = True
+
+        if not parse_failed:
+            try:
+                for host in parser.close():
+                    yield host
+            except ET.ParseError as e:
+                print(f"XML解析错误: {e}")
+
+        stderr = await stderr_task
+        await process.wait()
+        if process.returncode != 0:
+            raise NmapCommandError(process.returncode, stderr.decode(errors="replace"))
+    finally:
+        # 调用方提前结束迭代或出错时终止nmap进程
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        if not stderr_task.done():
+            stderr_task.cancel()
@@ -1,17 +1,129 @@
 import asyncio
+import concurrent.futures
+import errno
+import fcntl
 import subprocess
 import json
+import os
 import re
 import socket
+import struct
+import time
 import ipaddress
-import xml.etree.ElementTree as ET
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime
-import concurrent.futures
 from dataclasses import dataclass
 
+from models.oui_parser import extract_oui, oui_parser
+from scanner.nmap_xml import (
+    HOSTGROUP_ARGS,
+    index_host_element,
+    iter_open_ports,
+    online_targets,
+    stream_nmap_hosts,
+    targets_input,
+)
+from models.scan_config import ScanPresets
+from storage.file_storage import file_storage
+
+
+# ICMP echo 扫描参数
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+ICMP_PAYLOAD = b"lan-watcher"
+ICMP_SEND_BURST = 64  # 每发送这么多个请求让出一次事件循环，避免瞬间发包过多被丢弃
+ICMP_REPLY_TIMEOUT = 2.0  # 发送完毕后等待回复的秒数，与逐个ping的超时一致
+# 接收时可忽略的错误（对端不可达等ICMP错误报告、被信号中断），其他错误时停止接收
+ICMP_TRANSIENT_ERRNOS = frozenset({
+    errno.EINTR, errno.EAGAIN, errno.ECONNREFUSED, errno.EHOSTUNREACH, errno.ENETUNREACH,
+})
+
+# 解析系统命令输出的正则，模块加载时编译一次
+IFCONFIG_INET_PATTERN = re.compile(r"inet (\d+\.\d+\.\d+\.\d+)")
+# 匹配格式: hostname (ip) at mac [ether] on interface
+ARP_LINE_PATTERN = re.compile(r"(\S+) \((\d+\.\d+\.\d+\.\d+)\) at ([a-fA-F0-9:]{17})")
+PING_TIME_PATTERN = re.compile(r"time=(\d+\.?\d*) ms")
+
+# 获取默认路由接口地址（Linux）
+PROC_NET_ROUTE = "/proc/net/route"
+SIOCGIFADDR = 0x8915
+
+# OUI数据库不可用时的备用厂商映射（简化的常见厂商，键与OUI缓存相同，为24位整数）
+COMMON_VENDORS = {
+    extract_oui(prefix): vendor
+    for prefix, vendor in {
+        "00:50:56": "VMware",
+        "08:00:27": "VirtualBox",
+        "52:54:00": "QEMU",
+        "00:0C:29": "VMware",
+        "00:1B:21": "Intel",
+        "00:23:24": "Apple",
+        "D8:9E:F3": "Apple",
+        "AC:DE:48": "Apple",
+    }.items()
+}
+
+# 同时进行的反向DNS查询数上限（查询在事件循环的线程池中执行）
+HOSTNAME_RESOLVE_CONCURRENCY = 32
+HOSTNAME_LOOKUP_TIMEOUT = 1.0  # 单次查询超时，离线主机的查询不拖慢整批
+HOSTNAME_CACHE_TTL = 300.0  # 查询结果（包括查不到）的缓存秒数，定时扫描不重复查询同一IP
+HOSTNAME_CACHE_MAX_ENTRIES = 4096  # 超过后清理过期条目
+
+# 反向DNS查询专用线程池（所有事件循环共用）；查询的超时从线程开始执行时计算，
+# 在线程池中排队的时间不计入超时
+hostname_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=HOSTNAME_RESOLVE_CONCURRENCY, thread_name_prefix="lan-dns"
+)
+
+
+def _icmp_checksum(data: bytes) -> int:
+    """计算ICMP校验和"""
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def _default_interface_ip() -> Optional[str]:
+    """从 /proc/net/route 找到默认路由的网络接口，再通过ioctl读取接口的IPv4地址
+    仅支持Linux，其他系统或读取失败时返回None"""
+    try:
+        with open(PROC_NET_ROUTE) as f:
+            next(f)  # 跳过表头
+            for line in f:
+                fields = line.split()
+                # Destination为00000000的是默认路由
+                if len(fields) > 1 and fields[1] == "00000000":
+                    interface = fields[0]
+                    break
+            else:
+                return None
+
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            ifreq = fcntl.ioctl(
+                sock.fileno(), SIOCGIFADDR, struct.pack("256s", interface[:15].encode())
+            )
+        return socket.inet_ntoa(ifreq[20:24])
+    except (OSError, StopIteration):
+        return None
+
+
+def _open_icmp_socket() -> Optional[Tuple[socket.socket, bool]]:
+    """创建ICMP套接字，返回 (套接字, 是否为原始套接字)，没有权限时返回None
+    优先使用无需特权的ping套接字，其次是原始套接字（需要root或CAP_NET_RAW）"""
+    for sock_type in (socket.SOCK_DGRAM, socket.SOCK_RAW):
+        try:
+            sock = socket.socket(socket.AF_INET, sock_type, socket.IPPROTO_ICMP)
+        except OSError:
+            continue
+        sock.setblocking(False)
+        return sock, sock_type == socket.SOCK_RAW
+    return None
+
 
-@dataclass
+@dataclass(slots=True)
 class DeviceInfo:
     ip: str
     mac: Optional[str] = None
@@ -26,15 +138,11 @@ class NetworkScanner:
     def __init__(self, scan_config=None):
         # 扫描配置 - 如果没有提供则使用默认配置
         if scan_config is None:
-            try:
-                from models.scan_config import ScanPresets
-
-                self.config = ScanPresets.balanced()
-            except:
-                # 如果导入失败，创建最基本的配置
-                self.config = None
+            self.config = ScanPresets.balanced()
         else:
             self.config = scan_config
+        # 反向DNS查询结果缓存: IP -> (过期时间, 主机名)
+        self._hostname_cache: Dict[str, Tuple[float, Optional[str]]] = {}
 
     def _get_vendor_from_oui_db(self, mac: str) -> Optional[str]:
         """从OUI数据库查找厂商信息"""
@@ -42,8 +150,6 @@ class NetworkScanner:
             return None
 
         try:
-            from models.oui_parser import oui_parser
-
             return oui_parser.lookup_vendor(mac)
         except Exception as e:
             print(f"Error looking up vendor for {mac}: {e}")
@@ -54,23 +160,10 @@ class NetworkScanner:
         if not mac:
             return None
 
-        # 简化的常见厂商映射
-        common_vendors = {
-            "00:50:56": "VMware",
-            "08:00:27": "VirtualBox",
-            "52:54:00": "QEMU",
-            "00:0C:29": "VMware",
-            "00:1B:21": "Intel",
-            "00:23:24": "Apple",
-            "D8:9E:F3": "Apple",
-            "AC:DE:48": "Apple",
-        }
-
-        oui = mac.replace(":", "").replace("-", "").upper()[:6]
-        # 转换为带冒号格式进行匹配
-        oui_formatted = ":".join([oui[i : i + 2] for i in range(0, 6, 2)]).upper()
-
-        return common_vendors.get(oui_formatted)
+        oui = extract_oui(mac)
+        if oui is None:
+            return None
+        return COMMON_VENDORS.get(oui)
 
     async def get_local_subnet(self) -> str:
         """获取本地子网"""
@@ -105,26 +198,25 @@ class NetworkScanner:
 
         # 降级到传统方法
         try:
-            # 获取默认网关
-            result = subprocess.run(
-                ["route", "-n", "get", "default"], capture_output=True, text=True
-            )
+            # 获取默认路由所在接口的IP（Linux下直接读取内核信息，不启动子进程）
+            ip = _default_interface_ip()
+            if ip is None:
+                # 获取默认网关
+                stdout = await self._run_command(["route", "-n", "get", "default"])
 
-            for line in result.stdout.split("\n"):
-                if "interface:" in line:
-                    interface = line.split(":")[1].strip()
-                    break
+                for line in stdout.split("\n"):
+                    if "interface:" in line:
+                        interface = line.split(":")[1].strip()
+                        break
 
-            # 获取接口IP
-            result = subprocess.run(
-                ["ifconfig", interface], capture_output=True, text=True
-            )
+                # 获取接口IP
+                stdout = await self._run_command(["ifconfig", interface])
 
-            ip_pattern = r"inet (\d+\.\d+\.\d+\.\d+)"
-            match = re.search(ip_pattern, result.stdout)
+                match = IFCONFIG_INET_PATTERN.search(stdout)
+                if match:
+                    ip = match.group(1)
 
-            if match:
-                ip = match.group(1)
+            if ip:
                 # 智能推断子网掩码
                 ip_obj = ipaddress.IPv4Address(ip)
                 if ip_obj.is_private:
@@ -154,6 +246,14 @@ class NetworkScanner:
             return self.config.get_effective_subnet(detected_subnet)
         return detected_subnet
 
+    async def _run_command(self, cmd: List[str]) -> str:
+        """异步运行系统命令并返回标准输出，不阻塞事件循环"""
+        process = await asyncio.create_subprocess_exec(
+            *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+        )
+        stdout, _ = await process.communicate()
+        return stdout.decode(errors="ignore")
+
     async def _run_nmap_command(self, nmap_args: List[str]) -> str:
         """运行nmap命令"""
         cmd = ["nmap"] + nmap_args
@@ -173,6 +273,25 @@ class NetworkScanner:
         except Exception as e:
             raise Exception(f"Failed to run nmap: {str(e)}")
 
+    async def _run_nmap_scan(
+        self, nmap_args: List[str], stdin_data: Optional[bytes] = None
+    ) -> List[DeviceInfo]:
+        """运行输出XML的nmap扫描，边从管道读取边解析，不缓存完整输出"""
+        devices = []
+        try:
+            async for host in stream_nmap_hosts(["nmap"] + nmap_args, stdin_data):
+                try:
+                    device = self._parse_host_element(host)
+                except Exception as e:
+                    print(f"解析nmap输出时出错: {e}")
+                    continue
+                if device:
+                    devices.append(device)
+        except Exception as e:
+            raise Exception(f"Failed to run nmap: {str(e)}")
+
+        return devices
+
     async def ping_host(self, ip: str) -> Optional[DeviceInfo]:
         """Ping单个主机"""
         # 检查是否应该排除该IP
@@ -186,8 +305,7 @@ class NetworkScanner:
             else:
                 nmap_args = ["-sn", "-PE", ip]
 
-            output = await self._run_nmap_command(nmap_args)
-            devices = self._parse_xml_output(output)
+            devices = await self._run_nmap_scan(nmap_args)
 
             if devices:
                 device = devices[0]
@@ -211,30 +329,12 @@ class NetworkScanner:
                 return None
 
         # 降级到传统ping方法
-        try:
-            result = subprocess.run(
-                ["ping", "-c", "1", "-W", "1000", ip],
-                capture_output=True,
-                text=True,
-                timeout=2,
-            )
-
-            if result.returncode == 0:
-                # 提取响应时间
-                time_pattern = r"time=(\d+\.?\d*) ms"
-                time_match = re.search(time_pattern, result.stdout)
-                response_time = int(float(time_match.group(1))) if time_match else None
-
-                device = DeviceInfo(ip=ip, is_online=True, response_time=response_time)
+        device = await self._async_ping(ip)
+        if device:
+            # 尝试获取主机名
+            device.hostname = await self._get_hostname(ip)
 
-                # 尝试获取主机名
-                device.hostname = await self._get_hostname(ip)
-
-                return device
-        except Exception as e:
-            print(f"Ping error for {ip}: {e}")
-
-        return None
+        return device
 
     async def arp_scan(self, subnet: str) -> List[DeviceInfo]:
         """ARP扫描发现设备"""
@@ -278,7 +378,7 @@ class NetworkScanner:
             return []
 
         try:
-            target_str = ",".join(targets)
+            # 目标通过标准输入一次性传给nmap（-iL -），由nmap自己并行调度所有主机
             nmap_args = [
                 "-sS",  # TCP SYN扫描
                 "-sV",  # 服务版本检测
@@ -290,19 +390,19 @@ class NetworkScanner:
                 "500",
                 "--max-retries",
                 "2",
+                *HOSTGROUP_ARGS,
                 "-oX",
                 "-",
-                target_str,
+                "-iL",
+                "-",
             ]
 
-            print(f"使用nmap扫描端口 {ports} 在目标: {target_str}")
-            output = await self._run_nmap_command(nmap_args)
-            devices = self._parse_xml_output(output)
+            print(f"使用nmap扫描端口 {ports} 在 {len(targets)} 个目标上")
+            devices = await self._run_nmap_scan(nmap_args, targets_input(targets))
 
             # 补充主机名和厂商信息
+            await self._resolve_hostnames(devices)
             for device in devices:
-                if not device.hostname:
-                    device.hostname = await self._get_hostname(device.ip)
                 if device.mac and not device.vendor:
                     device.vendor = self._get_vendor_from_oui_db(device.mac)
 
@@ -331,54 +431,29 @@ class NetworkScanner:
                 return []
 
             # 第二步：对发现的主机进行端口扫描
-            active_ips = [d.ip for d in devices if d.is_online]
+            active_ips = online_targets(devices)
             print(f"发现 {len(active_ips)} 个活跃主机，开始端口扫描...")
 
-            # 分批扫描避免超时
-            batch_size = 10
-            detailed_devices = []
-
-            for i in range(0, len(active_ips), batch_size):
-                batch = active_ips[i : i + batch_size]
-                batch_results = await self.scan_ports(
-                    batch, "22,23,53,80,135,139,443,445,993,995"
-                )
-                detailed_devices.extend(batch_results)
-
-            return detailed_devices
+            # 所有主机在一次nmap调用中扫描，由nmap按主机组并行
+            return await self.scan_ports(
+                active_ips, "22,23,53,80,135,139,443,445,993,995"
+            )
 
         except Exception as e:
             print(f"Comprehensive scan error: {e}")
             return devices if "devices" in locals() else []
 
-    def _parse_xml_output(self, xml_output: str) -> List[DeviceInfo]:
-        """解析nmap XML输出"""
-        devices = []
-
-        try:
-            root = ET.fromstring(xml_output)
-
-            for host in root.findall("host"):
-                device = self._parse_host_element(host)
-                if device:
-                    devices.append(device)
-
-        except ET.ParseError as e:
-            print(f"XML解析错误: {e}")
-        except Exception as e:
-            print(f"解析nmap输出时出错: {e}")
-
-        return devices
-
     def _parse_host_element(self, host_element) -> Optional[DeviceInfo]:
         """解析单个主机元素"""
+        # 一次遍历取出所有需要的子元素
+        children, address_elements = index_host_element(host_element)
+
         # 获取状态
-        status = host_element.find("status")
+        status = children.get("status")
         if status is None or status.get("state") != "up":
             return None
 
         # 获取IP地址
-        address_elements = host_element.findall("address")
         ip = None
         mac = None
         vendor = None
@@ -395,7 +470,7 @@ class NetworkScanner:
 
         # 获取主机名
         hostname = None
-        hostnames = host_element.find("hostnames")
+        hostnames = children.get("hostnames")
         if hostnames is not None:
             hostname_elem = hostnames.find("hostname")
             if hostname_elem is not None:
@@ -403,7 +478,7 @@ class NetworkScanner:
 
         # 获取响应时间
         response_time = None
-        times = host_element.find("times")
+        times = children.get("times")
         if times is not None:
             rtt = times.get("rttvar")
             if rtt:
@@ -411,14 +486,11 @@ class NetworkScanner:
 
         # 解析端口信息（如果有的话）
         open_ports = []
-        ports_element = host_element.find("ports")
+        ports_element = children.get("ports")
 
         if ports_element is not None:
-            for port in ports_element.findall("port"):
-                state_elem = port.find("state")
-                if state_elem is not None and state_elem.get("state") == "open":
-                    port_num = int(port.get("portid"))
-                    open_ports.append(port_num)
+            for port, _ in iter_open_ports(ports_element):
+                open_ports.append(int(port.get("portid")))
 
         # 如果通过OUI数据库获取到更准确的厂商信息，优先使用
         if mac and not vendor:
@@ -443,9 +515,7 @@ class NetworkScanner:
 
             # 解析ARP表输出
             for line in result.stdout.split("\n"):
-                # 匹配格式: hostname (ip) at mac [ether] on interface
-                arp_pattern = r"(\S+) \((\d+\.\d+\.\d+\.\d+)\) at ([a-fA-F0-9:]{17})"
-                match = re.search(arp_pattern, line)
+                match = ARP_LINE_PATTERN.search(line)
 
                 if match:
                     hostname, ip, mac = match.groups()
@@ -499,8 +569,7 @@ class NetworkScanner:
                     ]
                     print(f"使用默认配置扫描子网 {subnet}..., args: {nmap_args}")
 
-                output = await self._run_nmap_command(nmap_args)
-                devices = self._parse_xml_output(output)
+                devices = await self._run_nmap_scan(nmap_args)
 
                 # 补充MAC地址信息（通过ARP表）
                 arp_devices = await self._scan_arp_table()
@@ -522,10 +591,6 @@ class NetworkScanner:
                             if not device.vendor:
                                 device.vendor = arp_device.vendor
 
-                        # 根据配置补充主机名
-                        if not device.hostname and (not self.config or self.config.resolve_hostnames):
-                            device.hostname = await self._get_hostname(device.ip)
-
                         # 根据配置通过OUI数据库获取厂商信息
                         if device.mac and not device.vendor and (not self.config or self.config.fetch_vendor_info):
                             device.vendor = self._get_vendor_from_oui_db(device.mac)
@@ -534,6 +599,10 @@ class NetworkScanner:
                 
                 devices = filtered_devices
 
+                # 根据配置并发补充主机名
+                if not self.config or self.config.resolve_hostnames:
+                    await self._resolve_hostnames(devices)
+
                 print(f"nmap扫描完成，发现 {len(devices)} 个设备")
                 return devices
 
@@ -551,16 +620,20 @@ class NetworkScanner:
                 devices = await self.arp_scan(subnet)
             elif scan_type == "ping":
                 print(f"使用传统ping扫描子网 {subnet}...")
-                # 并发ping扫描
-                with concurrent.futures.ThreadPoolExecutor(max_workers=50) as executor:
-                    loop = asyncio.get_event_loop()
-                    tasks = []
+                hosts = [str(ip) for ip in network.hosts()]
+                # 用一个ICMP套接字批量ping整个子网，不再为每个IP启动ping进程
+                devices = await self._icmp_sweep(hosts)
+                if devices is None:
+                    # 没有ICMP套接字权限时，退回并发ping进程，用信号量限制同时运行的进程数
+                    semaphore = asyncio.Semaphore(
+                        self.config.max_workers if self.config else 50
+                    )
 
-                    for ip in network.hosts():
-                        task = loop.run_in_executor(executor, self._sync_ping, str(ip))
-                        tasks.append(task)
+                    async def bounded_ping(ip: str) -> Optional[DeviceInfo]:
+                        async with semaphore:
+                            return await self._async_ping(ip)
 
-                    results = await asyncio.gather(*tasks)
+                    results = await asyncio.gather(*(bounded_ping(ip) for ip in hosts))
                     devices = [d for d in results if d is not None]
 
             # 为在线设备尝试获取主机名和厂商信息（根据配置决定）
@@ -571,10 +644,6 @@ class NetworkScanner:
                     if self.config and self.config.should_exclude_ip(device.ip):
                         continue
                         
-                    # 根据配置补充主机名
-                    if not device.hostname and (not self.config or self.config.resolve_hostnames):
-                        device.hostname = await self._get_hostname(device.ip)
-                    
                     # 根据配置通过OUI数据库获取厂商信息
                     if device.mac and not device.vendor and (not self.config or self.config.fetch_vendor_info):
                         device.vendor = self._get_vendor_from_oui_db(device.mac)
@@ -583,39 +652,178 @@ class NetworkScanner:
             
             devices = filtered_devices
 
+            # 根据配置并发补充主机名
+            if not self.config or self.config.resolve_hostnames:
+                await self._resolve_hostnames(devices)
+
         except Exception as e:
             print(f"Subnet scan error: {e}")
 
         return devices
 
-    def _sync_ping(self, ip: str) -> Optional[DeviceInfo]:
-        """同步ping方法，用于线程池"""
+    async def _icmp_sweep(self, hosts: List[str]) -> Optional[List[DeviceInfo]]:
+        """通过一个ICMP套接字向所有主机发送echo请求并统一接收回复
+        无法创建ICMP套接字（权限不足）时返回None"""
+        if not hosts:
+            return []
+
+        opened = _open_icmp_socket()
+        if opened is None:
+            return None
+        sock, is_raw = opened
+
+        loop = asyncio.get_running_loop()
+        identifier = os.getpid() & 0xFFFF
+        sent_at: Dict[str, float] = {}
+        response_times: Dict[str, int] = {}
+        all_replied = asyncio.Event()
+
+        async def receive_replies():
+            while True:
+                try:
+                    data, (addr, _) = await loop.sock_recvfrom(sock, 1024)
+                except OSError as e:
+                    if e.errno in ICMP_TRANSIENT_ERRNOS:
+                        continue
+                    # 持续性错误（如套接字失效、网络断开）重试也不会恢复，立即重试会占满CPU
+                    print(f"ICMP receive error: {e}")
+                    return
+                if is_raw:
+                    # 原始套接字收到的数据包含IP头，且会收到所有ICMP报文，需要按标识符过滤
+                    data = data[(data[0] & 0x0F) * 4:]
+                    if len(data) < 8 or struct.unpack_from("!H", data, 4)[0] != identifier:
+                        continue
+                if len(data) < 8 or data[0] != ICMP_ECHO_REPLY:
+                    continue
+                if addr in sent_at and addr not in response_times:
+                    response_times[addr] = int((time.monotonic() - sent_at[addr]) * 1000)
+                    if len(response_times) == len(hosts):
+                        all_replied.set()
+
+        receiver = asyncio.create_task(receive_replies())
         try:
-            result = subprocess.run(
-                ["ping", "-c", "1", "-W", "1000", ip],
-                capture_output=True,
-                text=True,
-                timeout=2,
+            for seq, ip in enumerate(hosts):
+                header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, identifier, seq & 0xFFFF)
+                checksum = _icmp_checksum(header + ICMP_PAYLOAD)
+                packet = struct.pack(
+                    "!BBHHH", ICMP_ECHO_REQUEST, 0, checksum, identifier, seq & 0xFFFF
+                ) + ICMP_PAYLOAD
+                sent_at[ip] = time.monotonic()
+                try:
+                    await loop.sock_sendto(sock, packet, (ip, 0))
+                except OSError:
+                    # 网络不可达等发送错误视为离线
+                    pass
+                if seq % ICMP_SEND_BURST == ICMP_SEND_BURST - 1:
+                    await asyncio.sleep(0.01)
+
+            # 所有主机都已回复或接收已出错停止时不再等待超时
+            waiter = asyncio.create_task(all_replied.wait())
+            try:
+                await asyncio.wait(
+                    (waiter, receiver), timeout=ICMP_REPLY_TIMEOUT,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+            finally:
+                waiter.cancel()
+        finally:
+            receiver.cancel()
+            await asyncio.gather(receiver, return_exceptions=True)
+            sock.close()
+
+        return [
+            DeviceInfo(ip=ip, is_online=True, response_time=response_times[ip])
+            for ip in hosts
+            if ip in response_times
+        ]
+
+    async def _async_ping(self, ip: str) -> Optional[DeviceInfo]:
+        """异步ping单个IP，不占用事件循环和线程池"""
+        process = None
+        try:
+            process = await asyncio.create_subprocess_exec(
+                "ping", "-c", "1", "-W", "1000", ip,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
             )
+            stdout, _ = await asyncio.wait_for(process.communicate(), timeout=2)
 
-            if result.returncode == 0:
-                time_pattern = r"time=(\d+\.?\d*) ms"
-                time_match = re.search(time_pattern, result.stdout)
+            if process.returncode == 0:
+                time_match = PING_TIME_PATTERN.search(stdout.decode(errors="ignore"))
                 response_time = int(float(time_match.group(1))) if time_match else None
 
                 return DeviceInfo(ip=ip, is_online=True, response_time=response_time)
+        except asyncio.TimeoutError:
+            # 超时视为离线，结束残留的ping进程
+            if process and process.returncode is None:
+                process.kill()
+                await process.wait()
         except Exception:
             pass
 
         return None
 
     async def _get_hostname(self, ip: str) -> Optional[str]:
-        """获取主机名"""
+        """获取主机名（反向DNS查询在专用线程池中执行，不阻塞事件循环；结果按IP缓存）
+
+        线程池可能正被其他扫描的批量查询占满，等到查询线程开始执行后才计算超时，
+        单独的查询不会因为排队而超时。
+        """
+        now = time.monotonic()
+        cached = self._hostname_cache.get(ip)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+
+        loop = asyncio.get_running_loop()
+        started = loop.create_future()
+
+        def mark_started():
+            if not started.done():
+                started.set_result(None)
+
+        def resolve():
+            try:
+                loop.call_soon_threadsafe(mark_started)
+            except RuntimeError:
+                # 发起查询的事件循环已关闭
+                pass
+            return socket.getnameinfo((ip, 0), socket.NI_NAMEREQD)
+
+        lookup = asyncio.wrap_future(hostname_executor.submit(resolve))
         try:
-            hostname = socket.gethostbyaddr(ip)[0]
-            return hostname
-        except Exception:
+            await asyncio.wait((started, lookup), return_when=asyncio.FIRST_COMPLETED)
+            hostname, _ = await asyncio.wait_for(lookup, HOSTNAME_LOOKUP_TIMEOUT)
+        except asyncio.CancelledError:
+            # 还在排队的查询不再执行
+            lookup.cancel()
+            raise
+        except asyncio.TimeoutError:
+            # 超时可能只是DNS服务器暂时慢，不缓存
             return None
+        except Exception:
+            hostname = None
+
+        if len(self._hostname_cache) >= HOSTNAME_CACHE_MAX_ENTRIES:
+            # 清理过期条目，避免扫描大量不同子网时缓存无限增长
+            self._hostname_cache = {
+                key: entry
+                for key, entry in self._hostname_cache.items()
+                if entry[0] > now
+            }
+        self._hostname_cache[ip] = (now + HOSTNAME_CACHE_TTL, hostname)
+        return hostname
+
+    async def _resolve_hostnames(self, devices: List[DeviceInfo]):
+        """并发查询所有缺少主机名的设备的主机名，总耗时约为一次查询超时而不是N次"""
+        pending = [device for device in devices if not device.hostname]
+        if not pending:
+            return
+
+        hostnames = await asyncio.gather(
+            *(self._get_hostname(device.ip) for device in pending)
+        )
+        for device, hostname in zip(pending, hostnames):
+            device.hostname = hostname
 
     def _get_vendor_from_mac(self, mac: str) -> Optional[str]:
         """根据MAC地址获取厂商信息（已弃用，使用_get_vendor_from_oui_db）"""
@@ -638,13 +846,9 @@ scanner = NetworkScanner()
 def init_scanner_config():
     """初始化扫描器配置"""
     try:
-        from storage.file_storage import file_storage
-
         scanner.config = file_storage.get_scan_config()
         print(f"扫描器配置已加载: {scanner.config}")
     except Exception as e:
         print(f"加载扫描器配置失败: {e}")
-        from models.scan_config import ScanPresets
-
         scanner.config = ScanPresets.balanced()
         print("使用默认平衡配置")
@@ -8,6 +8,7 @@ from typing import List, Optional, Dict, Any
 from enum import Enum
 from .scanner import NetworkScanner, DeviceInfo as OriginalDeviceInfo  
 from .nmap_scanner import NmapScanner, DeviceInfo as NmapDeviceInfo, ServiceInfo
+from .nmap_xml import online_targets
 
 class ScanMode(Enum):
     BASIC = "basic"          # 原有ping+ARP扫描
@@ -65,7 +66,7 @@ class IntegratedScanner:
         
         # 对发现的设备进行基础端口扫描
         if devices:
-            active_ips = [d.ip for d in devices if d.is_online]
+            active_ips = online_targets(devices)
             detailed_devices = await self.nmap_scanner.port_scan(active_ips, "22,23,53,80,135,139,443,445,993,995")
             return [self._convert_nmap_device(device) for device in detailed_devices]
         
@@ -0,0 +1,47 @@
+import threading
+import time
+from typing import Any, Callable, Dict, Tuple
+
+
+class TTLCache:
+    """进程内的简单TTL缓存，用于缓存轮询频繁的接口结果"""
+
+    def __init__(self, default_ttl: float = 5.0):
+        self.default_ttl = default_ttl
+        self._entries: Dict[str, Tuple[float, Any]] = {}
+        self._generation = 0  # 每次失效递增，防止加载期间失效的旧值被写回
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key: str, loader: Callable[[], Any], ttl: float = None) -> Any:
+        """获取缓存值，不存在或已过期时调用loader重新加载"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                return entry[1]
+            generation = self._generation
+
+        # 在锁外加载，避免慢加载阻塞其他键的读取
+        value = loader()
+        expires_at = time.monotonic() + (self.default_ttl if ttl is None else ttl)
+        with self._lock:
+            if generation == self._generation:
+                self._entries[key] = (expires_at, value)
+        return value
+
+    def invalidate(self, *keys: str):
+        """使指定键失效"""
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        """清空全部缓存"""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
+# 接口响应缓存实例
+response_cache = TTLCache()
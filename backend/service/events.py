@@ -0,0 +1,73 @@
+import asyncio
+import json
+import threading
+from typing import Dict, Optional
+
+
+class EventBroadcaster:
+    """扫描事件广播器，把扫描开始/完成、设备变化等消息推送给所有SSE订阅者
+
+    每个订阅者只保留每种事件类型的最新一条，推送前的中间状态会被合并丢弃；
+    publish 可以在任意线程调用（扫描在独立的扫描线程和事件循环中执行）。
+    """
+
+    def __init__(self):
+        self._subscribers = {}  # 订阅ID -> (事件循环, 待推送事件, 唤醒标志)
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def subscribe(self) -> int:
+        """在当前事件循环中注册一个订阅者，返回订阅ID"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._next_id += 1
+            subscriber_id = self._next_id
+            self._subscribers[subscriber_id] = (loop, {}, asyncio.Event())
+        return subscriber_id
+
+    def unsubscribe(self, subscriber_id: int):
+        """注销订阅者"""
+        with self._lock:
+            self._subscribers.pop(subscriber_id, None)
+
+    def publish(self, event_type: str, **data):
+        """发布事件，同类型的未推送事件会被最新的一条覆盖"""
+        event = {"type": event_type, **data}
+        with self._lock:
+            subscribers = list(self._subscribers.values())
+        for loop, pending, flag in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._deliver, pending, flag, event)
+            except RuntimeError:
+                # 订阅者的事件循环已关闭
+                pass
+
+    @staticmethod
+    def _deliver(pending: Dict[str, dict], flag: asyncio.Event, event: dict):
+        pending[event["type"]] = event
+        flag.set()
+
+    async def wait(self, subscriber_id: int, timeout: float) -> Optional[list]:
+        """等待订阅者的新事件，超时返回None，否则取出并清空所有待推送事件"""
+        with self._lock:
+            subscriber = self._subscribers.get(subscriber_id)
+        if subscriber is None:
+            return None
+        _, pending, flag = subscriber
+        try:
+            await asyncio.wait_for(flag.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        flag.clear()
+        events = list(pending.values())
+        pending.clear()
+        return events
+
+
+def format_sse(event: dict) -> str:
+    """把事件编码为SSE消息"""
+    return f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+# 全局事件广播器实例
+event_broadcaster = EventBroadcaster()
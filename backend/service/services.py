@@ -1,18 +1,81 @@
 import asyncio
+import concurrent.futures
+import fcntl
+import ipaddress
 import json
-from datetime import datetime, timedelta
-from typing import List, Optional
+import threading
+from datetime import date, datetime, timedelta
+from itertools import groupby
+from operator import itemgetter
+from typing import Dict, List, Optional, Tuple
 
 from scanner.scanner import scanner, DeviceInfo
+from service.cache import response_cache
+from service.events import event_broadcaster
 from storage.file_storage import file_storage, Device, ScanRecord, ScanSession
 from models.scan_config import ScanConfig, ScanPresets
 
+# 跨进程的扫描锁：多个uvicorn worker共享同一个数据目录，同一时间只允许一个扫描
+SCAN_LOCK_FILE = file_storage.storage_dir / "scan.lock"
+
+# 默认扫描间隔（秒），未设置过时使用
+DEFAULT_SCAN_INTERVAL = 300  # 5分钟扫描一次
+# 等待下一次周期扫描时重新读取扫描间隔的周期（秒），其他worker进程修改间隔时无法直接唤醒本进程
+SCAN_STATE_POLL_SECONDS = 30
+
+def build_online_periods(statuses: List[Tuple[str, bool]]) -> List[dict]:
+    """根据按时间正序排列的 (扫描时间, 是否在线) 序列计算在线时间段
+    （扫描时间直接沿用存储中的ISO字符串，不做解析和重新格式化）"""
+    # 把连续相同状态的记录合并为一段，只保留每段的状态和起始时间，
+    # 状态切换点即为在线时段的开始和结束，逐条比较交给 groupby 完成
+    runs = [
+        (is_online, next(group)[0])
+        for is_online, group in groupby(statuses, key=itemgetter(1))
+    ]
+
+    online_periods = []
+    for index, (is_online, run_start) in enumerate(runs):
+        if not is_online:
+            continue
+        online_periods.append(
+            {
+                "start_time": run_start,
+                # 下一段（离线）的起始时间即为在线时段结束时间，最后一段仍在线时为None
+                "end_time": runs[index + 1][1] if index + 1 < len(runs) else None,
+            }
+        )
+
+    return online_periods
+
 class DeviceService:
     def __init__(self):
         self.scanning = False
-        self.scan_interval = 300  # 5分钟扫描一次
-        self.last_scan_time = None  # 最后一次扫描时间
+        # 已结束日期的在线时段（历史记录不再变化，可直接复用）: 日期 -> {设备ID: 时段列表}
+        self._day_periods: Dict[date, Dict[str, List[dict]]] = {}
+        # 周期扫描的唤醒事件及其所属事件循环（周期扫描启动后设置）
+        self._wake_event: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # 手动扫描专用的单线程执行器，长时间扫描不占用接口线程池
+        self.scan_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="lan-scan"
+        )
+        self._scan_future: Optional[concurrent.futures.Future] = None
+        self._scan_submit_lock = threading.Lock()
+        # 检查其他worker进程是否在扫描时使用的锁文件，进程内只打开一次
+        # （以追加模式打开，不会截断或重复创建文件）
+        self._scan_probe_file = open(SCAN_LOCK_FILE, "a")
+        self._scan_probe_lock = threading.Lock()
         
+    @property
+    def scan_interval(self) -> int:
+        """扫描间隔（秒），保存在存储中，所有worker进程共享"""
+        return file_storage.get_scan_state().get("scan_interval", DEFAULT_SCAN_INTERVAL)
+    
+    @property
+    def last_scan_time(self) -> Optional[str]:
+        """最后一次扫描时间（可能由其他worker进程执行）"""
+        return file_storage.get_scan_state().get("last_scan_time")
+    
     def get_device_by_ip(self, ip: str) -> Optional[Device]:
         """根据IP获取设备"""
         return file_storage.get_device_by_ip(ip)
@@ -29,10 +92,56 @@ class DeviceService:
         """获取在线设备"""
         return file_storage.get_online_devices()
     
+    def get_all_devices_data(self, skip: int = 0, limit: int = 100) -> List[dict]:
+        """获取所有设备的原始数据，供只读接口直接序列化"""
+        return file_storage.get_all_devices_data(skip, limit)
+    
+    def get_online_devices_data(self) -> List[dict]:
+        """获取在线设备的原始数据，供只读接口直接序列化"""
+        return file_storage.get_online_devices_data()
+    
     def get_device_history(self, device_id: str, hours: int = 24) -> List[ScanRecord]:
         """获取设备历史记录"""
         return file_storage.get_device_history(device_id, hours)
     
+    def get_day_online_periods(self, target_date: date) -> Dict[str, List[dict]]:
+        """获取指定日期每个设备的在线时段，已结束的日期结果会被缓存"""
+        cached = self._day_periods.get(target_date)
+        if cached is not None:
+            return cached
+        
+        day = target_date.isoformat()
+        
+        # 一次性读取当天各设备的在线状态序列（只取扫描时间和在线状态两个字段）
+        day_statuses = file_storage.get_online_statuses_between(
+            day + "T00:00:00", day + "T23:59:59.999999"
+        )
+        periods = {
+            device_id: build_online_periods(statuses)
+            for device_id, statuses in day_statuses.items()
+        }
+        
+        # 扫描时间使用UTC，只有UTC今天之前的日期才不会再有新记录；
+        # 超出数据保留期的日期记录会被清理，不缓存
+        cutoff = self._retention_cutoff()
+        if cutoff <= target_date < datetime.utcnow().date():
+            self._day_periods[target_date] = periods
+            self._prune_day_periods(cutoff)
+        return periods
+    
+    def _retention_cutoff(self) -> date:
+        """数据保留期内最早的日期"""
+        retention_days = file_storage.get_settings().data_retention_days
+        return datetime.utcnow().date() - timedelta(days=retention_days)
+    
+    def _prune_day_periods(self, cutoff: Optional[date] = None):
+        """丢弃超出数据保留期的在线时段缓存（写入缓存时执行，缓存最多保留保留期内的天数）"""
+        if cutoff is None:
+            cutoff = self._retention_cutoff()
+        for day in list(self._day_periods):
+            if day < cutoff:
+                self._day_periods.pop(day, None)
+    
     def create_or_update_device(self, device_info: DeviceInfo) -> Device:
         """创建或更新设备信息"""
         return file_storage.create_or_update_device(device_info)
@@ -41,10 +150,38 @@ class DeviceService:
         """标记设备为离线"""
         file_storage.mark_device_offline(device)
     
+    def _try_lock_scan(self):
+        """尝试获取扫描文件锁，成功时返回持有锁的文件对象，已被占用时返回None"""
+        lock_file = open(SCAN_LOCK_FILE, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return None
+        return lock_file
+    
+    def is_scan_running(self) -> bool:
+        """当前进程或其他worker进程是否正在扫描（涉及文件锁，异步代码中应在线程池中调用）"""
+        if self.scanning:
+            return True
+        with self._scan_probe_lock:
+            try:
+                fcntl.flock(self._scan_probe_file, fcntl.LOCK_SH | fcntl.LOCK_NB)
+            except OSError:
+                return True
+            fcntl.flock(self._scan_probe_file, fcntl.LOCK_UN)
+        return False
+    
+    def start_background_scan(self, subnet: str = None, scan_type: str = "ping") -> bool:
+        """在扫描线程中启动手动扫描，已有扫描在进行或排队时返回False（重复点击会被合并）"""
+        with self._scan_submit_lock:
+            if self.is_scan_running() or (self._scan_future is not None and not self._scan_future.done()):
+                return False
+            self._scan_future = self.scan_executor.submit(self.scan_network_sync, subnet, scan_type)
+            return True
+    
     def scan_network_sync(self, subnet: str = None, scan_type: str = "ping") -> dict:
-        """同步版本的网络扫描，用于后台任务"""
-        import asyncio
-        
+        """同步版本的网络扫描，在扫描线程中运行"""
         # 在新的事件循环中运行异步扫描
         try:
             loop = asyncio.new_event_loop()
@@ -58,49 +195,53 @@ class DeviceService:
         if self.scanning:
             return {"status": "error", "message": "Scan already in progress"}
         
+        # 其他worker进程正在扫描时同样拒绝
+        scan_lock = self._try_lock_scan()
+        if scan_lock is None:
+            return {"status": "error", "message": "Scan already in progress"}
+        
         self.scanning = True
+        scan_result = None
         
         try:
             # 记录扫描开始时间
             scan_start_time = datetime.utcnow()
+            event_broadcaster.publish("scan_started", scan_type=scan_type)
             
-            # 确保扫描器使用最新配置
-            if not scanner.config:
-                scanner.config = file_storage.get_scan_config()
+            # 每次扫描前从存储重新读取配置，配置可能由其他worker进程修改
+            scanner.config = await asyncio.to_thread(file_storage.get_scan_config)
             
             # 获取子网
             if not subnet:
                 subnet = await scanner.get_local_subnet()
             
-            # 创建扫描会话
-            scan_session = file_storage.create_scan_session(subnet, scan_type)
+            # 创建扫描会话（存储读写是阻塞的文件IO，放到线程中执行，避免扫描期间阻塞事件循环）
+            scan_session = await asyncio.to_thread(
+                file_storage.create_scan_session, subnet, scan_type
+            )
             
             # 执行扫描
             devices_found = await scanner.scan_subnet(subnet, scan_type)
             
-            # 获取当前在线设备IP列表
-            online_ips = {device.ip for device in devices_found if device.is_online}
-            
-            # 更新或创建设备记录
-            for device_info in devices_found:
-                self.create_or_update_device(device_info)
-            
-            # 标记不在扫描结果中的设备为离线
-            existing_devices = file_storage.get_online_devices()
-            for device in existing_devices:
-                if device.ip_address not in online_ips:
-                    self.mark_device_offline(device)
+            # 更新或创建设备记录，并标记不在扫描结果中的设备为离线（一次性批量写入）
+            await asyncio.to_thread(file_storage.apply_scan_results, devices_found)
             
             # 更新扫描会话
-            file_storage.update_scan_session(
+            await asyncio.to_thread(
+                file_storage.update_scan_session,
                 scan_session.id,
                 devices_found=len(devices_found)
             )
             
+            # 设备和统计数据已变化，使接口缓存失效
+            response_cache.invalidate("devices", "online_devices", "stats")
+            
             # 更新最后扫描时间
-            self.last_scan_time = scan_start_time.isoformat()
+            await asyncio.to_thread(
+                file_storage.update_scan_state, last_scan_time=scan_start_time.isoformat()
+            )
             
-            return {
+            scan_result = {
                 "status": "success",
                 "subnet": subnet,
                 "devices_found": len(devices_found),
@@ -109,9 +250,16 @@ class DeviceService:
             }
             
         except Exception as e:
-            return {"status": "error", "message": str(e)}
+            scan_result = {"status": "error", "message": str(e)}
         finally:
             self.scanning = False
+            scan_lock.close()
+        
+        # 释放扫描锁后再通知订阅者，客户端收到后查询扫描状态时已不再是扫描中
+        event_broadcaster.publish("scan_completed", **scan_result)
+        if scan_result["status"] == "success":
+            event_broadcaster.publish("devices_changed")
+        return scan_result
     
     # 保持原有接口兼容性
     async def scan_network(self, subnet: str = None, scan_type: str = "ping") -> dict:
@@ -120,6 +268,9 @@ class DeviceService:
     
     async def start_periodic_scan(self):
         """启动周期性扫描"""
+        self._loop = asyncio.get_running_loop()
+        self._wake_event = asyncio.Event()
+        
         while True:
             try:
                 print(f"Starting periodic scan at {datetime.now()}")
@@ -127,17 +278,45 @@ class DeviceService:
                 print(f"Scan completed: {result}")
                 
                 # 定期清理过期数据
-                file_storage.cleanup()
+                await asyncio.to_thread(file_storage.cleanup)
+                self._prune_day_periods()
                 
-                await asyncio.sleep(self.scan_interval)
+                await self._wait_for_next_scan()
             except Exception as e:
                 print(f"Periodic scan error: {e}")
                 await asyncio.sleep(60)  # 出错时等待1分钟再重试
     
+    async def _wait_for_next_scan(self):
+        """等待到下一次周期扫描；等待期间扫描间隔被修改时按新间隔重新计算剩余时间"""
+        started = self._loop.time()
+        while True:
+            scan_interval = await asyncio.to_thread(lambda: self.scan_interval)
+            remaining = started + scan_interval - self._loop.time()
+            if remaining <= 0:
+                return
+            self._wake_event.clear()
+            try:
+                # 间隔可能在其他worker进程中被修改，最多等待一个轮询周期后重新读取
+                await asyncio.wait_for(
+                    self._wake_event.wait(), timeout=min(remaining, SCAN_STATE_POLL_SECONDS)
+                )
+            except asyncio.TimeoutError:
+                pass
+    
+    def set_scan_interval(self, interval: int):
+        """修改扫描间隔（秒），并唤醒正在等待的周期扫描立即按新间隔生效（可在任意线程调用）"""
+        file_storage.update_scan_state(scan_interval=interval)
+        if self._wake_event is not None:
+            self._loop.call_soon_threadsafe(self._wake_event.set)
+    
     def get_scan_sessions(self, limit: int = 10) -> List[ScanSession]:
         """获取扫描会话历史"""
         return file_storage.get_scan_sessions(limit)
     
+    def get_scan_sessions_data(self, limit: int = 10) -> List[dict]:
+        """获取扫描会话历史的原始数据，供只读接口直接序列化"""
+        return file_storage.get_scan_sessions_data(limit)
+    
     def get_network_stats(self) -> dict:
         """获取网络统计信息"""
         return file_storage.get_network_stats()
@@ -147,6 +326,8 @@ class DeviceService:
         device = file_storage.update_device_alias(device_id, custom_name)
         if not device:
             raise ValueError("Device not found")
+        response_cache.invalidate("devices", "online_devices")
+        event_broadcaster.publish("devices_changed")
         return device
     
     def update_device_alias_by_mac(self, mac_address: str, custom_name: str) -> Device:
@@ -154,12 +335,38 @@ class DeviceService:
         device = file_storage.update_device_alias_by_mac(mac_address, custom_name)
         if not device:
             raise ValueError("Device not found")
+        response_cache.invalidate("devices", "online_devices")
+        event_broadcaster.publish("devices_changed")
         return device
     
     def search_devices(self, query: str) -> List[Device]:
         """搜索设备（根据IP、MAC、主机名、别名、厂商）"""
         return file_storage.search_devices(query)
 
+# 预设配置的展示信息（只包含基本信息，不构造完整配置对象）
+PRESET_INFO = (
+    {
+        "name": "fast",
+        "display_name": "快速扫描",
+        "description": "适合快速发现设备，扫描速度快但准确性稍低"
+    },
+    {
+        "name": "balanced",
+        "display_name": "平衡模式",
+        "description": "速度和准确性的平衡，推荐日常使用"
+    },
+    {
+        "name": "thorough",
+        "display_name": "详细扫描",
+        "description": "最大准确性，扫描时间较长"
+    },
+    {
+        "name": "stealth",
+        "display_name": "隐蔽扫描",
+        "description": "减少对网络的影响，扫描速度最慢"
+    }
+)
+
 class ScanConfigService:
     """扫描配置管理服务"""
     
@@ -169,12 +376,23 @@ class ScanConfigService:
     
     def update_scan_config(self, config: ScanConfig) -> ScanConfig:
         """更新扫描配置"""
-        # 验证配置
-        config.validate()
+        # 验证与写入在存储层的同一把锁内一次完成
         file_storage.update_scan_config(config)
         
         # 更新扫描器的配置
         scanner.config = config
+        response_cache.invalidate("scan_config")
+        return config
+    
+    def update_scan_config_from_dict(self, config_data: dict) -> ScanConfig:
+        """从字典（如导入的JSON或API请求体）更新扫描配置"""
+        # 构造时已在 __post_init__ 中完成验证，写入时无需再次验证
+        config = ScanConfig(**config_data)
+        file_storage.update_scan_config(config, validate=False)
+        
+        # 更新扫描器的配置
+        scanner.config = config
+        response_cache.invalidate("scan_config")
         return config
     
     def load_preset(self, preset_name: str) -> ScanConfig:
@@ -183,46 +401,13 @@ class ScanConfigService:
         
         # 更新扫描器的配置
         scanner.config = config
+        response_cache.invalidate("scan_config")
         return config
     
     def get_available_presets(self) -> List[dict]:
         """获取可用的预设配置列表"""
-        presets = [
-            {
-                "name": "fast",
-                "display_name": "快速扫描",
-                "description": "适合快速发现设备，扫描速度快但准确性稍低",
-                "config": ScanPresets.fast()
-            },
-            {
-                "name": "balanced", 
-                "display_name": "平衡模式",
-                "description": "速度和准确性的平衡，推荐日常使用",
-                "config": ScanPresets.balanced()
-            },
-            {
-                "name": "thorough",
-                "display_name": "详细扫描", 
-                "description": "最大准确性，扫描时间较长",
-                "config": ScanPresets.thorough()
-            },
-            {
-                "name": "stealth",
-                "display_name": "隐蔽扫描",
-                "description": "减少对网络的影响，扫描速度最慢",
-                "config": ScanPresets.stealth()
-            }
-        ]
-        
-        # 只返回基本信息，不包含完整配置对象
-        return [
-            {
-                "name": preset["name"],
-                "display_name": preset["display_name"], 
-                "description": preset["description"]
-            }
-            for preset in presets
-        ]
+        # 预设信息是静态的，返回副本避免调用方修改共享数据
+        return [dict(preset) for preset in PRESET_INFO]
     
     def validate_config(self, config_data: dict) -> dict:
         """验证配置数据"""
@@ -237,7 +422,7 @@ class ScanConfigService:
         """测试网络配置"""
         try:
             if subnet_cidr:
-                import ipaddress
+                # 仅读取网络属性，不枚举主机，任意前缀长度都是O(1)
                 network = ipaddress.IPv4Network(subnet_cidr, strict=False)
                 return {
                     "valid": True,
@@ -1,7 +1,11 @@
+import fcntl
 import json
 import os
+import tempfile
+from bisect import bisect_left, bisect_right
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Tuple, Callable
+from contextlib import contextmanager
 from dataclasses import dataclass, asdict
 from pathlib import Path
 import threading
@@ -78,6 +82,17 @@ class ChartConfig:
     time_format: str = "24h"  # '12h' or '24h'
     device_sort_order: str = "name"  # 'name', 'ip', or 'last_seen'
 
+# 参与搜索的设备字段
+SEARCH_FIELDS = ('ip_address', 'mac_address', 'hostname', 'custom_name', 'vendor')
+
+def _trigrams(text: str) -> set:
+    """文本中所有长度为3的子串"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def _scan_time_key(record_data: dict) -> str:
+    """扫描记录的排序键"""
+    return record_data.get('scan_time', '')
+
 class FileStorage:
     """基于文件的数据存储"""
     
@@ -88,55 +103,220 @@ class FileStorage:
         # 数据文件路径
         self.devices_file = self.storage_dir / "devices.json"
         self.scan_records_file = self.storage_dir / "scan_records.json"
+        self.scan_records_log_file = self.storage_dir / "scan_records.log"
         self.scan_sessions_file = self.storage_dir / "scan_sessions.json"
         self.settings_file = self.storage_dir / "settings.json"
         self.chart_config_file = self.storage_dir / "chart_config.json"
         self.scan_config_file = self.storage_dir / "scan_config.json"
+        self.scan_state_file = self.storage_dir / "scan_state.json"
         
         # 线程锁
         self._lock = threading.RLock()
         
-        # 初始化文件
-        self._init_files()
-    
-    def _init_files(self):
-        """初始化数据文件"""
-        # 设备文件
-        if not self.devices_file.exists():
-            self._save_json(self.devices_file, {})
+        # 跨进程写锁：多个worker进程共享数据目录，读取-修改-保存期间持有该文件上的flock
+        self._flock_file = open(self.storage_dir / "storage.lock", "a")
+        self._flock_depth = 0
+        
+        # 已解析JSON文档缓存: 文件路径 -> ((mtime_ns, size, inode), 数据)
+        # 保存使用原子替换，每次保存都会换成新的inode，同一时间戳内写入相同大小的内容也能识别
+        self._json_cache: Dict[Path, Tuple[Tuple[int, int, int], Any]] = {}
         
-        # 扫描记录文件
-        if not self.scan_records_file.exists():
-            self._save_json(self.scan_records_file, [])
+        # 扫描记录按设备ID的索引: (索引对应的记录列表, 已索引条数, 设备ID -> 记录列表)
+        self._records_index: Tuple[Optional[list], int, Dict[str, List[dict]]] = (None, 0, {})
         
-        # 扫描会话文件
-        if not self.scan_sessions_file.exists():
-            self._save_json(self.scan_sessions_file, [])
+        # 扫描记录 = 快照文件 + 追加日志（每行一条JSON记录），新记录只追加到日志，
+        # 清理过期记录或日志过大时才重写快照。内存中保存合并后的完整列表
+        self._records: Optional[list] = None
+        self._records_state: Tuple[Optional[Tuple[int, int]], int] = (None, 0)  # (快照版本, 已读取的日志字节数)
         
-        # 设置文件
-        if not self.settings_file.exists():
-            self._save_json(self.settings_file, asdict(AppSettings()))
+        # 每个文件的保存次数，用于判断基于该文件数据建立的索引是否过期
+        self._save_counts: Dict[Path, int] = {}
         
-        # 图表配置文件
-        if not self.chart_config_file.exists():
-            self._save_json(self.chart_config_file, asdict(ChartConfig()))
+        # 设备查找索引: ((索引对应的设备数据, 保存次数), IP -> 设备ID, MAC -> 设备ID)
+        self._device_index: Tuple[Optional[Tuple[Any, int]], Dict[str, str], Dict[str, str]] = (None, {}, {})
         
-        # 扫描配置文件 - 使用默认的平衡模式
-        if not self.scan_config_file.exists():
-            self._save_json(self.scan_config_file, asdict(ScanPresets.balanced()))
+        # 设备搜索的三元组倒排索引: ((索引对应的设备数据, 保存次数), 三元组 -> 设备ID集合, 设备ID -> 原始顺序)
+        self._search_index: Tuple[Optional[Tuple[Any, int]], Dict[str, set], Dict[str, int]] = (None, {}, {})
+        
+        # 初始化文件
+        self._init_files()
     
-    def _load_json(self, file_path: Path) -> Any:
-        """加载JSON文件"""
+    def _init_files(self):
+        """初始化数据文件"""
+        # 多个worker进程同时启动时只由一个进程创建缺失的文件
+        with self._write_lock():
+            # 设备文件
+            if not self.devices_file.exists():
+                self._save_json(self.devices_file, {})
+            
+            # 扫描记录文件
+            if not self.scan_records_file.exists():
+                self._save_json(self.scan_records_file, [])
+            
+            # 扫描会话文件
+            if not self.scan_sessions_file.exists():
+                self._save_json(self.scan_sessions_file, [])
+            
+            # 设置文件
+            if not self.settings_file.exists():
+                self._save_json(self.settings_file, asdict(AppSettings()))
+            
+            # 图表配置文件
+            if not self.chart_config_file.exists():
+                self._save_json(self.chart_config_file, asdict(ChartConfig()))
+            
+            # 扫描配置文件 - 使用默认的平衡模式
+            if not self.scan_config_file.exists():
+                self._save_json(self.scan_config_file, asdict(ScanPresets.balanced()))
+    
+    @contextmanager
+    def _write_lock(self):
+        """写锁（可重入）：线程锁 + 数据目录锁文件上的flock，保证其他worker进程的
+        读取-修改-保存不会与本进程交错，也不会覆盖本进程刚保存的数据"""
+        with self._lock:
+            if self._flock_depth == 0:
+                fcntl.flock(self._flock_file, fcntl.LOCK_EX)
+            self._flock_depth += 1
+            try:
+                yield
+            except BaseException:
+                # 调用方直接修改 _load_json 返回的缓存数据后再保存，中途出错时缓存已与磁盘不一致，
+                # 丢弃缓存，下次从磁盘重新加载
+                self._json_cache.clear()
+                raise
+            finally:
+                self._flock_depth -= 1
+                if self._flock_depth == 0:
+                    fcntl.flock(self._flock_file, fcntl.LOCK_UN)
+    
+    def _write_atomic(self, file_path: Path, dump: Callable[[Any], None]):
+        """通过同目录下唯一的临时文件写入后原子替换，读取方不会看到写了一半的文件"""
+        fd, tmp_path = tempfile.mkstemp(dir=file_path.parent, prefix=file_path.name + '.', suffix='.tmp')
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return {} if file_path.name in ['devices.json', 'settings.json', 'chart_config.json', 'scan_config.json'] else []
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                dump(f)
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+    
+    def _load_json(self, file_path: Path) -> Any:
+        """加载JSON文件（文件未变化时直接复用已解析的数据）"""
+        with self._lock:
+            try:
+                stat = file_path.stat()
+                version = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+                cached = self._json_cache.get(file_path)
+                if cached is not None and cached[0] == version:
+                    return cached[1]
+                
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self._json_cache[file_path] = (version, data)
+                return data
+            except (FileNotFoundError, json.JSONDecodeError):
+                self._json_cache.pop(file_path, None)
+                return {} if file_path.name in ['devices.json', 'settings.json', 'chart_config.json', 'scan_config.json', 'scan_state.json'] else []
     
     def _save_json(self, file_path: Path, data: Any):
-        """保存JSON文件"""
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        """保存JSON文件（先写临时文件再原子替换，读取方不会看到写了一半的文件）"""
+        with self._write_lock():
+            self._write_atomic(file_path, lambda f: json.dump(data, f, ensure_ascii=False, indent=2))
+            
+            stat = file_path.stat()
+            self._json_cache[file_path] = ((stat.st_mtime_ns, stat.st_size, stat.st_ino), data)
+            self._save_counts[file_path] = self._save_counts.get(file_path, 0) + 1
+    
+    def get_data_version(self, *file_paths: Path) -> Tuple[Tuple[int, int, int], ...]:
+        """获取数据文件的版本 (mtime_ns, size, inode)，文件每次保存后都会变化，可用于生成ETag
+        
+        原子替换每次都会换新的inode，即使大小不变且在mtime精度内重写也能区分。
+        """
+        versions = []
+        for file_path in file_paths:
+            try:
+                stat = file_path.stat()
+                versions.append((stat.st_mtime_ns, stat.st_size, stat.st_ino))
+            except FileNotFoundError:
+                versions.append((0, 0, 0))
+        return tuple(versions)
+    
+    def _load_records(self) -> list:
+        """加载扫描记录（快照 + 追加日志）
+        日志只是变长时只读取新增的行；快照被替换或日志被截断时（其他进程压缩过）完整重新加载"""
+        with self._lock:
+            snapshot_version, log_version = self.get_data_version(self.scan_records_file, self.scan_records_log_file)
+            known_snapshot, log_offset = self._records_state
+            records = self._records
+            
+            full_reload = records is None or snapshot_version != known_snapshot or log_version[1] < log_offset
+            if full_reload:
+                try:
+                    with open(self.scan_records_file, 'r', encoding='utf-8') as f:
+                        records = json.load(f)
+                except (FileNotFoundError, json.JSONDecodeError):
+                    records = []
+                log_offset = 0
+            
+            if log_version[1] > log_offset:
+                with open(self.scan_records_log_file, 'rb') as f:
+                    f.seek(log_offset)
+                    data = f.read()
+                # 只处理完整的行，其他进程正在写入的半行留到下次读取
+                data = data[:data.rfind(b'\n') + 1]
+                log_offset += len(data)
+                
+                # 压缩中断（快照已写入、日志尚未截断）时日志中的记录可能已在快照中
+                known_ids = {record.get('id') for record in records} if full_reload and records else None
+                for line in data.splitlines():
+                    if not line.strip():
+                        continue
+                    try:
+                        record_data = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if known_ids is None or record_data.get('id') not in known_ids:
+                        records.append(record_data)
+            
+            self._records = records
+            self._records_state = (snapshot_version, log_offset)
+            return records
+    
+    def _append_records(self, new_records: List[dict]):
+        """追加扫描记录到日志（不重写已有记录）"""
+        with self._write_lock():
+            records = self._load_records()
+            data = ''.join(
+                json.dumps(record_data, ensure_ascii=False, separators=(',', ':')) + '\n'
+                for record_data in new_records
+            ).encode('utf-8')
+            with open(self.scan_records_log_file, 'ab') as f:
+                f.write(data)
+                end_offset = f.tell()
+            
+            snapshot_version, log_offset = self._records_state
+            if end_offset == log_offset + len(data):
+                records.extend(new_records)
+                self._records_state = (snapshot_version, end_offset)
+            else:
+                # 其他进程同时追加过记录，下次访问时完整重新加载
+                self._records = None
+    
+    def _compact_records(self, records: list):
+        """把扫描记录写成新的快照并清空追加日志"""
+        with self._write_lock():
+            self._write_atomic(
+                self.scan_records_file,
+                lambda f: json.dump(records, f, ensure_ascii=False, separators=(',', ':'))
+            )
+            # 先写快照再截断日志：中间中断时重新加载会按ID去重
+            open(self.scan_records_log_file, 'wb').close()
+            
+            self._records = records
+            self._records_state = (self.get_data_version(self.scan_records_file)[0], 0)
     
     def _generate_id(self) -> str:
         """生成唯一ID"""
@@ -150,35 +330,58 @@ class FileStorage:
             cutoff_date = datetime.utcnow() - timedelta(days=retention_days)
             cutoff_iso = cutoff_date.isoformat()
             
-            # 清理扫描记录
-            records = self._load_json(self.scan_records_file)
-            filtered_records = [
-                record for record in records 
-                if record.get('scan_time', '') > cutoff_iso
-            ]
-            if len(filtered_records) < len(records):
-                self._save_json(self.scan_records_file, filtered_records)
+            # 清理扫描记录（过期记录累积到一定比例或日志比快照大时才重写快照，
+            # 否则每次扫描后都会重写全部历史；少量未清理的过期记录不影响按时间范围的查询）
+            with self._write_lock():
+                records = self._load_records()
+                filtered_records = [
+                    record for record in records 
+                    if record.get('scan_time', '') > cutoff_iso
+                ]
+                expired = len(records) - len(filtered_records)
+                snapshot_version, log_version = self.get_data_version(self.scan_records_file, self.scan_records_log_file)
+                if (expired and expired * 10 >= len(records)) or log_version[1] > snapshot_version[1]:
+                    self._compact_records(filtered_records)
             
             # 清理扫描会话
-            sessions = self._load_json(self.scan_sessions_file)
-            filtered_sessions = [
-                session for session in sessions 
-                if session.get('start_time', '') > cutoff_iso
-            ]
-            if len(filtered_sessions) < len(sessions):
-                self._save_json(self.scan_sessions_file, filtered_sessions)
+            with self._write_lock():
+                sessions = self._load_json(self.scan_sessions_file)
+                filtered_sessions = [
+                    session for session in sessions 
+                    if session.get('start_time', '') > cutoff_iso
+                ]
+                if len(filtered_sessions) < len(sessions):
+                    self._save_json(self.scan_sessions_file, filtered_sessions)
                 
         except Exception as e:
             print(f"清理过期记录时出错: {e}")
     
     # 设备相关操作
+    def _get_device_index(self) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """获取 IP -> 设备ID 和 MAC -> 设备ID 索引，设备文件保存或从磁盘重新加载后自动重建
+        （重复的IP/MAC取第一个设备，与逐个查找的结果一致）"""
+        with self._lock:
+            devices_data = self._load_json(self.devices_file)
+            version = self._device_index[0]
+            save_count = self._save_counts.get(self.devices_file, 0)
+            if version is None or version[0] is not devices_data or version[1] != save_count:
+                version = (devices_data, save_count)
+                by_ip: Dict[str, str] = {}
+                by_mac: Dict[str, str] = {}
+                for device_id, device_data in devices_data.items():
+                    by_ip.setdefault(device_data.get('ip_address'), device_id)
+                    if device_data.get('mac_address'):
+                        by_mac.setdefault(device_data['mac_address'], device_id)
+                self._device_index = (version, by_ip, by_mac)
+            return self._device_index[1], self._device_index[2]
+    
     def get_device_by_ip(self, ip: str) -> Optional[Device]:
         """根据IP获取设备"""
         with self._lock:
             devices_data = self._load_json(self.devices_file)
-            for device_data in devices_data.values():
-                if device_data.get('ip_address') == ip:
-                    return Device(**device_data)
+            device_id = self._get_device_index()[0].get(ip)
+            if device_id:
+                return Device(**devices_data[device_id])
             return None
     
     def get_device_by_id(self, device_id: str) -> Optional[Device]:
@@ -199,6 +402,13 @@ class FileStorage:
             devices.sort(key=lambda x: x.last_seen, reverse=True)
             return devices[skip:skip+limit]
     
+    def get_all_devices_data(self, skip: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+        """获取所有设备的原始数据（只读接口使用，省去构造Device对象）"""
+        with self._lock:
+            devices_data = self._load_json(self.devices_file)
+            devices = sorted(devices_data.values(), key=lambda x: x.get('last_seen') or '', reverse=True)
+            return [dict(data) for data in devices[skip:skip+limit]]
+    
     def get_online_devices(self) -> List[Device]:
         """获取在线设备"""
         with self._lock:
@@ -209,55 +419,59 @@ class FileStorage:
                     online_devices.append(Device(**data))
             return online_devices
     
+    def get_online_devices_data(self) -> List[Dict[str, Any]]:
+        """获取在线设备的原始数据（只读接口使用）"""
+        with self._lock:
+            devices_data = self._load_json(self.devices_file)
+            return [dict(data) for data in devices_data.values() if data.get('is_online', False)]
+    
+    def _apply_device_info(self, devices_data: Dict[str, dict], existing_device_id: Optional[str],
+                           device_info, current_time: str) -> dict:
+        """将扫描到的设备信息合并到设备数据中，返回更新后的设备数据"""
+        if existing_device_id:
+            # 更新现有设备
+            device_data = devices_data[existing_device_id]
+            device_data['last_seen'] = current_time
+            device_data['is_online'] = device_info.is_online
+            
+            # 只在没有值时更新这些字段
+            if device_info.mac and not device_data.get('mac_address'):
+                device_data['mac_address'] = device_info.mac
+            if device_info.hostname and not device_data.get('hostname'):
+                device_data['hostname'] = device_info.hostname
+            if device_info.vendor and not device_data.get('vendor'):
+                device_data['vendor'] = device_info.vendor
+            if device_info.open_ports:
+                device_data['open_ports'] = device_info.open_ports
+        else:
+            # 创建新设备
+            device_id = self._generate_id()
+            device_data = {
+                'id': device_id,
+                'ip_address': device_info.ip,
+                'mac_address': device_info.mac,
+                'hostname': device_info.hostname,
+                'vendor': device_info.vendor,
+                'is_online': device_info.is_online,
+                'first_seen': current_time,
+                'last_seen': current_time,
+                'open_ports': device_info.open_ports or [],
+                'custom_name': None,
+                'device_type': None
+            }
+            devices_data[device_id] = device_data
+        return device_data
+    
     def create_or_update_device(self, device_info) -> Device:
         """创建或更新设备信息"""
-        with self._lock:
+        with self._write_lock():
             devices_data = self._load_json(self.devices_file)
             
             # 查找现有设备
-            existing_device_id = None
-            for device_id, device_data in devices_data.items():
-                if device_data.get('ip_address') == device_info.ip:
-                    existing_device_id = device_id
-                    break
+            existing_device_id = self._get_device_index()[0].get(device_info.ip)
             
             current_time = datetime.utcnow().isoformat()
-            
-            if existing_device_id:
-                # 更新现有设备
-                device_data = devices_data[existing_device_id]
-                device_data['last_seen'] = current_time
-                device_data['is_online'] = device_info.is_online
-                
-                # 只在没有值时更新这些字段
-                if device_info.mac and not device_data.get('mac_address'):
-                    device_data['mac_address'] = device_info.mac
-                if device_info.hostname and not device_data.get('hostname'):
-                    device_data['hostname'] = device_info.hostname
-                if device_info.vendor and not device_data.get('vendor'):
-                    device_data['vendor'] = device_info.vendor
-                if device_info.open_ports:
-                    device_data['open_ports'] = device_info.open_ports
-                
-                device = Device(**device_data)
-            else:
-                # 创建新设备
-                device_id = self._generate_id()
-                device_data = {
-                    'id': device_id,
-                    'ip_address': device_info.ip,
-                    'mac_address': device_info.mac,
-                    'hostname': device_info.hostname,
-                    'vendor': device_info.vendor,
-                    'is_online': device_info.is_online,
-                    'first_seen': current_time,
-                    'last_seen': current_time,
-                    'open_ports': device_info.open_ports or [],
-                    'custom_name': None,
-                    'device_type': None
-                }
-                devices_data[device_id] = device_data
-                device = Device(**device_data)
+            device = Device(**self._apply_device_info(devices_data, existing_device_id, device_info, current_time))
             
             # 保存设备数据
             self._save_json(self.devices_file, devices_data)
@@ -273,9 +487,57 @@ class FileStorage:
             
             return device
     
+    def apply_scan_results(self, device_infos) -> int:
+        """批量写入一次扫描的结果：更新或创建设备、标记未出现的在线设备为离线，
+        设备文件和扫描记录文件各只写一次。返回写入的扫描记录数"""
+        with self._write_lock():
+            devices_data = self._load_json(self.devices_file)
+            
+            # IP -> 设备ID（复制一份，本次新建的设备也会加入）
+            ip_index = dict(self._get_device_index()[0])
+            
+            current_time = datetime.utcnow().isoformat()
+            new_records = []
+            online_ips = set()
+            
+            for device_info in device_infos:
+                device_data = self._apply_device_info(
+                    devices_data, ip_index.get(device_info.ip), device_info, current_time
+                )
+                ip_index.setdefault(device_info.ip, device_data['id'])
+                if device_info.is_online:
+                    online_ips.add(device_info.ip)
+                
+                new_records.append(asdict(ScanRecord(
+                    id=self._generate_id(),
+                    device_id=device_data['id'],
+                    scan_time=current_time,
+                    is_online=device_info.is_online,
+                    response_time=device_info.response_time
+                )))
+            
+            # 标记不在扫描结果中的设备为离线
+            for device_id, device_data in devices_data.items():
+                if device_data.get('is_online', False) and device_data.get('ip_address') not in online_ips:
+                    device_data['is_online'] = False
+                    device_data['last_seen'] = current_time
+                    new_records.append(asdict(ScanRecord(
+                        id=self._generate_id(),
+                        device_id=device_id,
+                        scan_time=current_time,
+                        is_online=False
+                    )))
+            
+            self._save_json(self.devices_file, devices_data)
+            
+            if new_records:
+                self._append_records(new_records)
+            
+            return len(new_records)
+    
     def mark_device_offline(self, device: Device):
         """标记设备为离线"""
-        with self._lock:
+        with self._write_lock():
             devices_data = self._load_json(self.devices_file)
             if device.id in devices_data:
                 devices_data[device.id]['is_online'] = False
@@ -292,7 +554,7 @@ class FileStorage:
     
     def update_device_alias(self, device_id: str, custom_name: str) -> Optional[Device]:
         """更新设备自定义别名"""
-        with self._lock:
+        with self._write_lock():
             devices_data = self._load_json(self.devices_file)
             if device_id in devices_data:
                 devices_data[device_id]['custom_name'] = custom_name.strip() if custom_name else None
@@ -302,65 +564,144 @@ class FileStorage:
     
     def update_device_alias_by_mac(self, mac_address: str, custom_name: str) -> Optional[Device]:
         """通过MAC地址更新设备别名"""
-        with self._lock:
+        with self._write_lock():
             devices_data = self._load_json(self.devices_file)
-            for device_id, device_data in devices_data.items():
-                if device_data.get('mac_address') == mac_address:
-                    device_data['custom_name'] = custom_name.strip() if custom_name else None
-                    self._save_json(self.devices_file, devices_data)
-                    return Device(**device_data)
+            device_id = self._get_device_index()[1].get(mac_address)
+            if device_id:
+                device_data = devices_data[device_id]
+                device_data['custom_name'] = custom_name.strip() if custom_name else None
+                self._save_json(self.devices_file, devices_data)
+                return Device(**device_data)
             return None
     
+    def _get_search_index(self) -> Tuple[Dict[str, set], Dict[str, int]]:
+        """获取设备搜索的三元组倒排索引，设备文件保存或从磁盘重新加载后自动重建"""
+        with self._lock:
+            devices_data = self._load_json(self.devices_file)
+            version = self._search_index[0]
+            save_count = self._save_counts.get(self.devices_file, 0)
+            if version is None or version[0] is not devices_data or version[1] != save_count:
+                trigram_index: Dict[str, set] = {}
+                for device_id, device_data in devices_data.items():
+                    for field_name in SEARCH_FIELDS:
+                        value = device_data.get(field_name)
+                        if not value:
+                            continue
+                        for trigram in _trigrams(str(value).lower()):
+                            trigram_index.setdefault(trigram, set()).add(device_id)
+                positions = {device_id: position for position, device_id in enumerate(devices_data)}
+                self._search_index = ((devices_data, save_count), trigram_index, positions)
+            return self._search_index[1], self._search_index[2]
+    
+    def _matches_query(self, device_data: dict, query_lower: str) -> bool:
+        """设备的任一搜索字段包含查询串（不区分大小写）"""
+        return any(
+            query_lower in str(device_data.get(field_name)).lower()
+            for field_name in SEARCH_FIELDS
+            if device_data.get(field_name)
+        )
+    
     def search_devices(self, query: str) -> List[Device]:
         """搜索设备"""
         with self._lock:
             devices_data = self._load_json(self.devices_file)
             query_lower = query.lower()
-            results = []
-            
-            for device_data in devices_data.values():
-                # 搜索字段
-                search_fields = [
-                    device_data.get('ip_address', ''),
-                    device_data.get('mac_address', ''),
-                    device_data.get('hostname', ''),
-                    device_data.get('custom_name', ''),
-                    device_data.get('vendor', '')
+            
+            if len(query_lower) < 3:
+                # 查询串不足一个三元组，逐个设备匹配
+                return [
+                    Device(**device_data)
+                    for device_data in devices_data.values()
+                    if self._matches_query(device_data, query_lower)
                 ]
-                
-                if any(query_lower in str(field).lower() for field in search_fields if field):
-                    results.append(Device(**device_data))
             
-            return results
+            # 包含查询串的字段必然包含它的所有三元组：从最小的集合开始求交集得到候选设备，
+            # 再对少量候选做子串确认（三元组可能分散在不同位置或不同字段）
+            trigram_index, positions = self._get_search_index()
+            posting_lists = sorted(
+                (trigram_index.get(trigram, ()) for trigram in _trigrams(query_lower)),
+                key=len,
+            )
+            candidates = set(posting_lists[0])
+            for posting_list in posting_lists[1:]:
+                if not candidates:
+                    break
+                candidates &= posting_list
+            
+            # 按设备原始顺序返回，与逐个匹配的结果一致
+            return [
+                Device(**devices_data[device_id])
+                for device_id in sorted(candidates, key=positions.__getitem__)
+                if self._matches_query(devices_data[device_id], query_lower)
+            ]
     
     # 扫描记录相关操作
     def add_scan_record(self, scan_record: ScanRecord):
         """添加扫描记录"""
+        self._append_records([asdict(scan_record)])
+    
+    def _get_records_by_device(self) -> Dict[str, List[dict]]:
+        """获取按设备ID分组的扫描记录索引（记录只追加时增量更新，否则重建）
+        每个设备的记录按扫描时间正序排列，可直接二分查找时间范围"""
         with self._lock:
-            records = self._load_json(self.scan_records_file)
-            records.append(asdict(scan_record))
-            self._save_json(self.scan_records_file, records)
+            records = self._load_records()
+            source, indexed, index = self._records_index
+            if source is not records or indexed > len(records):
+                index = {}
+                indexed = 0
+            
+            unordered = set()
+            for record_data in records[indexed:]:
+                device_records = index.setdefault(record_data.get('device_id'), [])
+                if device_records and record_data.get('scan_time', '') < device_records[-1].get('scan_time', ''):
+                    unordered.add(record_data.get('device_id'))
+                device_records.append(record_data)
+            # 记录通常按时间追加，只有时钟回拨等情况才需要重新排序
+            for device_id in unordered:
+                index[device_id].sort(key=_scan_time_key)
+            
+            self._records_index = (records, len(records), index)
+            return index
+    
+    @staticmethod
+    def _slice_by_time(device_records: List[dict], start_time: str, end_time: Optional[str] = None) -> List[dict]:
+        """在按时间正序排列的记录中二分查找 [start_time, end_time] 范围内的记录"""
+        lo = bisect_left(device_records, start_time, key=_scan_time_key)
+        hi = len(device_records) if end_time is None else bisect_right(device_records, end_time, key=_scan_time_key)
+        return device_records[lo:hi]
     
     def get_device_history(self, device_id: str, hours: int = 24) -> List[ScanRecord]:
         """获取设备历史记录"""
         with self._lock:
-            records = self._load_json(self.scan_records_file)
+            device_index = self._get_records_by_device().get(device_id, [])
             since = (datetime.utcnow() - timedelta(hours=hours)).isoformat()
             
-            device_records = []
-            for record_data in records:
-                if (record_data.get('device_id') == device_id and 
-                    record_data.get('scan_time', '') >= since):
-                    device_records.append(ScanRecord(**record_data))
+            device_records = [
+                ScanRecord(**record_data)
+                for record_data in self._slice_by_time(device_index, since)
+            ]
             
             # 按时间倒序排序
             device_records.sort(key=lambda x: x.scan_time, reverse=True)
             return device_records
     
+    def get_online_statuses_between(self, start_time: str, end_time: str) -> Dict[str, List[Tuple[str, bool]]]:
+        """获取时间范围内各设备的 (扫描时间, 是否在线) 序列，按时间正序排列（不构造ScanRecord对象）"""
+        with self._lock:
+            statuses_by_device = {}
+            for device_id, device_records in self._get_records_by_device().items():
+                statuses = [
+                    (record_data.get('scan_time', ''), record_data.get('is_online', False))
+                    for record_data in self._slice_by_time(device_records, start_time, end_time)
+                ]
+                if statuses:
+                    statuses_by_device[device_id] = statuses
+            return statuses_by_device
+    
     # 扫描会话相关操作
     def create_scan_session(self, subnet: str, scan_type: str) -> ScanSession:
         """创建扫描会话"""
-        with self._lock:
+        with self._write_lock():
             session = ScanSession(
                 id=self._generate_id(),
                 start_time=datetime.utcnow().isoformat(),
@@ -374,7 +715,7 @@ class FileStorage:
     
     def update_scan_session(self, session_id: str, **kwargs):
         """更新扫描会话"""
-        with self._lock:
+        with self._write_lock():
             sessions = self._load_json(self.scan_sessions_file)
             for session_data in sessions:
                 if session_data.get('id') == session_id:
@@ -389,10 +730,17 @@ class FileStorage:
         """获取扫描会话历史"""
         with self._lock:
             sessions = self._load_json(self.scan_sessions_file)
-            # 按开始时间倒序排序
-            sessions.sort(key=lambda x: x.get('start_time', ''), reverse=True)
+            # 按开始时间倒序排序（不修改缓存中的原始列表）
+            sessions = sorted(sessions, key=lambda x: x.get('start_time', ''), reverse=True)
             return [ScanSession(**data) for data in sessions[:limit]]
     
+    def get_scan_sessions_data(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """获取扫描会话历史的原始数据（只读接口使用）"""
+        with self._lock:
+            sessions = self._load_json(self.scan_sessions_file)
+            sessions = sorted(sessions, key=lambda x: x.get('start_time', ''), reverse=True)
+            return [dict(data) for data in sessions[:limit]]
+    
     # 统计信息
     def get_network_stats(self) -> Dict[str, int]:
         """获取网络统计信息"""
@@ -422,9 +770,11 @@ class FileStorage:
             return AppSettings(**settings_data)
     
     def update_settings(self, settings: AppSettings):
-        """更新应用设置"""
-        with self._lock:
-            self._save_json(self.settings_file, asdict(settings))
+        """更新应用设置（内容未变化时不重写文件）"""
+        with self._write_lock():
+            settings_data = asdict(settings)
+            if self._load_json(self.settings_file) != settings_data:
+                self._save_json(self.settings_file, settings_data)
     
     # 图表配置相关操作
     def get_chart_config(self) -> ChartConfig:
@@ -434,9 +784,11 @@ class FileStorage:
             return ChartConfig(**config_data)
     
     def update_chart_config(self, config: ChartConfig):
-        """更新图表配置"""
-        with self._lock:
-            self._save_json(self.chart_config_file, asdict(config))
+        """更新图表配置（内容未变化时不重写文件）"""
+        with self._write_lock():
+            config_data = asdict(config)
+            if self._load_json(self.chart_config_file) != config_data:
+                self._save_json(self.chart_config_file, config_data)
     
     # 扫描配置相关操作
     def get_scan_config(self) -> ScanConfig:
@@ -452,11 +804,12 @@ class FileStorage:
                 self._save_json(self.scan_config_file, asdict(default_config))
                 return default_config
     
-    def update_scan_config(self, config: ScanConfig):
-        """更新扫描配置"""
-        with self._lock:
+    def update_scan_config(self, config: ScanConfig, validate: bool = True):
+        """更新扫描配置（validate=False 用于刚构造、已在 __post_init__ 中验证过的配置）"""
+        with self._write_lock():
             # 验证配置
-            config.validate()
+            if validate:
+                config.validate()
             self._save_json(self.scan_config_file, asdict(config))
     
     def load_scan_preset(self, preset_name: str) -> ScanConfig:
@@ -475,6 +828,19 @@ class FileStorage:
         self.update_scan_config(config)
         return config
     
+    # 扫描运行状态（扫描间隔、最后扫描时间），由所有worker进程共享
+    def get_scan_state(self) -> Dict[str, Any]:
+        """获取扫描运行状态"""
+        with self._lock:
+            return dict(self._load_json(self.scan_state_file))
+    
+    def update_scan_state(self, **kwargs):
+        """更新扫描运行状态中的指定字段"""
+        with self._write_lock():
+            state = dict(self._load_json(self.scan_state_file))
+            state.update(kwargs)
+            self._save_json(self.scan_state_file, state)
+    
     # 维护操作
     def cleanup(self):
         """清理过期数据"""
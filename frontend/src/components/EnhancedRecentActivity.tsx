@@ -131,17 +131,11 @@ export const EnhancedRecentActivity: React.FC<EnhancedRecentActivityProps> = ({
     }
   };
 
-  // 初始加载和设备变化时重新加载
+  // 初始加载和设备变化时重新加载（设备变化由服务端事件推送触发）
   useEffect(() => {
     loadActivities();
   }, [devices, scanStatus]);
 
-  // 每30秒自动刷新
-  useEffect(() => {
-    const interval = setInterval(loadActivities, 30000);
-    return () => clearInterval(interval);
-  }, [devices, scanStatus]);
-
   const getActivityIcon = (activityType: string) => {
     switch (activityType) {
       case "online":
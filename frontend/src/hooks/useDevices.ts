@@ -1,3 +1,4 @@
+import { useEffect } from "react";
 import { useMutation, useQuery, useQueryClient } from "react-query";
 import { toast } from "react-toastify";
 import ApiService from "../services/api";
@@ -35,7 +36,6 @@ export const useDevices = () => {
       toast.error(message);
     },
     onSettled: () => setLoading(false),
-    refetchInterval: 30000, // 30秒自动刷新
     staleTime: 10000, // 10秒内数据被认为是新鲜的
   });
 };
@@ -48,7 +48,6 @@ export const useOnlineDevices = () => {
     () => ApiService.getOnlineDevices(),
     {
       onSuccess: setOnlineDevices,
-      refetchInterval: 15000, // 15秒刷新在线设备
       staleTime: 5000,
     },
   );
@@ -85,20 +84,51 @@ export const useNetworkStats = () => {
     () => ApiService.getNetworkStats(),
     {
       onSuccess: setNetworkStats,
-      refetchInterval: 30000,
       staleTime: 15000,
     },
   );
 };
 
+// 订阅服务端事件（SSE），扫描状态或设备变化时刷新相关查询，代替定时轮询
+export const useServerEvents = () => {
+  const queryClient = useQueryClient();
+
+  useEffect(() => {
+    const source = new EventSource(ApiService.getEventsUrl());
+
+    const refreshScanStatus = () => {
+      queryClient.invalidateQueries(QUERY_KEYS.SCAN_STATUS);
+    };
+    const refreshDevices = () => {
+      queryClient.invalidateQueries(QUERY_KEYS.DEVICES);
+      queryClient.invalidateQueries(QUERY_KEYS.ONLINE_DEVICES);
+      queryClient.invalidateQueries(QUERY_KEYS.NETWORK_STATS);
+      queryClient.invalidateQueries(QUERY_KEYS.SCAN_SESSIONS);
+      queryClient.invalidateQueries(QUERY_KEYS.TIMELINE_DATA);
+    };
+
+    source.addEventListener("scan_started", refreshScanStatus);
+    source.addEventListener("scan_completed", refreshScanStatus);
+    source.addEventListener("devices_changed", refreshDevices);
+    // 断线重连后可能错过了事件，全部刷新一次
+    source.addEventListener("open", () => {
+      refreshScanStatus();
+      refreshDevices();
+    });
+
+    return () => source.close();
+  }, [queryClient]);
+};
+
 // 扫描相关Hook
 export const useScanStatus = () => {
   const setScanStatus = useDeviceStore((state) => state.setScanStatus);
 
   return useQuery(QUERY_KEYS.SCAN_STATUS, () => ApiService.getScanStatus(), {
     onSuccess: setScanStatus,
-    refetchInterval: 2000, // 5秒刷新扫描状态
     staleTime: 1000,
+    // SSE断开或事件遗漏时的兜底刷新
+    refetchInterval: 30000,
   });
 };
 
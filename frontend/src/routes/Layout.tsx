@@ -1,7 +1,11 @@
 import { Outlet } from "react-router-dom";
 import { Sidebar } from "@/components/Sidebar";
+import { useServerEvents } from "@/hooks/useDevices";
 
 const Layout = () => {
+  // 全局只订阅一次服务端事件
+  useServerEvents();
+
   return (
     <div
       id="layout"
@@ -104,6 +104,11 @@ class ApiService {
     return ApiService.request("/api/scan-status");
   }
 
+  // 服务端事件流（SSE）地址
+  public static getEventsUrl(): string {
+    return `${API_BASE_URL}/api/events`;
+  }
+
   public static async getScanSessions(limit: number = 10): Promise<any[]> {
     return ApiService.request<any[]>(`/api/scan-sessions?limit=${limit}`);
   }